@@ -5,18 +5,39 @@ Monitors files for changes and proposes fixes with user approval.
 """
 
 import asyncio
+import importlib.util
+import os
+import re
+import sys
 import time
+from collections import deque
+from collections.abc import Iterable
 from pathlib import Path
 
-from claude_code_sdk import ClaudeCodeOptions, query
-from watchdog.events import FileSystemEvent, FileSystemEventHandler
+import pathspec
+from claude_code_sdk import (
+    AssistantMessage,
+    ClaudeCodeOptions,
+    ResultMessage,
+    TextBlock,
+    UserMessage,
+    query,
+)
+from watchdog.events import (
+    EVENT_TYPE_CREATED,
+    EVENT_TYPE_MODIFIED,
+    FileSystemEvent,
+    FileSystemEventHandler,
+)
 from watchdog.observers import Observer
 
 
 def extract_text_from_message(message) -> str:
     """Extract text content from a Claude SDK message.
 
-    Handles both AssistantMessage (with content) and ResultMessage formats.
+    Handles both message types with content (AssistantMessage, UserMessage)
+    and the final ResultMessage. A match on the SDK classes dispatches on
+    type once instead of probing attributes for every streamed message.
 
     Args:
         message: A message object from the Claude SDK query() stream.
@@ -24,83 +45,279 @@ def extract_text_from_message(message) -> str:
     Returns:
         Extracted text content, or empty string if no text found.
     """
-    if hasattr(message, "content"):
-        if isinstance(message.content, str):
-            return message.content
-        elif isinstance(message.content, list):
-            return "".join(
-                block.text for block in message.content if hasattr(block, "text")
-            )
-    elif hasattr(message, "result") and message.result:
-        return str(message.result)
-    return ""
+    match message:
+        case AssistantMessage(content=blocks) | UserMessage(content=list() as blocks):
+            return "".join(block.text for block in blocks if isinstance(block, TextBlock))
+        case UserMessage(content=str() as text):
+            return text
+        case ResultMessage(result=result) if result:
+            return str(result)
+        case _:
+            return ""
 
 
 # Configuration
 WATCH_DIR = Path(__file__).parent.resolve()
 IGNORE_PATTERNS = {".git", "__pycache__", "venv", ".venv", "node_modules", ".pyc", ".pyo"}
 DEBOUNCE_SECONDS = 2.0  # Wait for rapid changes to settle
+COALESCE_SECONDS = 0.2  # Extra wait to fold nearly-ready changes into one batch
 
+# Claude options are fixed for the life of the process, so build them once
+_CWD = str(WATCH_DIR)
+_ANALYZE_OPTIONS = ClaudeCodeOptions(
+    allowed_tools=["Read", "Glob", "Grep"],  # Read-only for analysis
+    cwd=_CWD,
+)
+_FIX_OPTIONS = ClaudeCodeOptions(
+    allowed_tools=["Read", "Edit", "Write", "Glob", "Grep"],
+    cwd=_CWD,
+)
 
-class ChangeTracker:
-    """Tracks file changes with debouncing."""
+# Words in an analysis that suggest Claude found something worth fixing
+_ISSUE_RE = re.compile(r"issue|error|bug|fix|problem|should", re.IGNORECASE)
+
+
+def compile_ignore_patterns(patterns: set[str]) -> re.Pattern[str]:
+    """Compile ignore patterns into a single regex.
+
+    A path matches if any of its components equals a pattern or if the path
+    ends with a pattern (e.g. ".pyc"), mirroring a ``Path(path).parts``
+    membership test without building a Path per event.
+
+    Args:
+        patterns: Directory names or suffixes to ignore.
+
+    Returns:
+        Compiled pattern to be used with ``search()``.
+    """
+    alternatives = "|".join(re.escape(p) for p in sorted(patterns, key=len, reverse=True))
+    sep = "[" + re.escape(os.sep + (os.altsep or "")) + "]"
+    return re.compile(rf"(?:^|{sep})(?:{alternatives}){sep}|(?:{alternatives})$")
+
+
+_IGNORE_RE = compile_ignore_patterns(IGNORE_PATTERNS)
 
-    def __init__(self):
-        self.pending_changes: dict[str, float] = {}
-        self.lock = asyncio.Lock()
 
-    async def add_change(self, path: str):
-        async with self.lock:
-            self.pending_changes[path] = time.time()
+def load_gitignore_spec(root: Path) -> pathspec.GitIgnoreSpec | None:
+    """Load root/.gitignore into a matcher.
+
+    Args:
+        root: Directory whose .gitignore should be read.
+
+    Returns:
+        A GitIgnoreSpec for the file, or None if it is missing or unreadable.
+    """
+    try:
+        lines = (root / ".gitignore").read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return None
+    return pathspec.GitIgnoreSpec.from_lines(lines)
+
+
+class ChangeTracker:
+    """Tracks file changes with debouncing.
+
+    Pending changes live in a deque of (deadline, seq, path) entries. Every
+    entry uses the same DEBOUNCE_SECONDS offset from a monotonic clock, so
+    appending keeps the deque sorted by deadline. Re-adding a path appends
+    a fresh entry and bumps its sequence number in ``_latest``; superseded
+    entries are discarded lazily when they reach the front.
+    """
 
-    async def get_ready_changes(self) -> list[str]:
+    def __init__(self):
+        self._queue: deque[tuple[float, int, str]] = deque()
+        self._latest: dict[str, int] = {}
+        self._seq = 0
+        self._wake = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._latest)
+
+    def __contains__(self, path: object) -> bool:
+        return path in self._latest
+
+    def add_change(self, path: str):
+        """Record a change to path; must be called on the event loop thread."""
+        self._seq += 1
+        self._latest[path] = self._seq
+        self._queue.append((time.monotonic() + DEBOUNCE_SECONDS, self._seq, path))
+        self._wake.set()
+
+    def _drop_stale(self) -> None:
+        """Pop superseded entries off the front of the queue."""
+        queue = self._queue
+        while queue and self._latest.get(queue[0][2]) != queue[0][1]:
+            queue.popleft()
+
+    def get_next_deadline(self) -> float | None:
+        """Seconds until the oldest pending change settles, or None if idle."""
+        self._drop_stale()
+        if not self._queue:
+            return None
+        return self._queue[0][0] - time.monotonic()
+
+    async def wait_for_changes(self) -> None:
+        """Sleep until a new change arrives or the next debounce deadline passes.
+
+        With nothing pending this blocks until add_change() is called, so an
+        idle watcher does not wake up at all.
+        """
+        delay = self.get_next_deadline()
+        try:
+            if delay is None:
+                await self._wake.wait()
+            else:
+                await asyncio.wait_for(self._wake.wait(), timeout=max(delay, 0))
+        except asyncio.TimeoutError:
+            pass
+        self._wake.clear()
+
+    def get_ready_changes(self) -> list[str]:
         """Get changes that have settled (no updates for DEBOUNCE_SECONDS).
 
-        Uses single-pass pop() to atomically collect and remove ready items,
-        avoiding potential race conditions from two-phase collect-then-delete.
+        Only pops entries whose deadline has passed, so the cost is
+        proportional to the number of ready (or superseded) entries rather
+        than the number of pending paths.
         """
-        async with self.lock:
-            now = time.time()
-            ready = []
-            # Single-pass: identify and remove in one operation per item
-            paths_to_remove = [
-                path for path, timestamp in self.pending_changes.items()
-                if now - timestamp >= DEBOUNCE_SECONDS
-            ]
-            for path in paths_to_remove:
-                self.pending_changes.pop(path, None)  # Atomic remove, ignores if missing
+        now = time.monotonic()
+        queue = self._queue
+        ready = []
+        while queue and queue[0][0] <= now:
+            _, seq, path = queue.popleft()
+            if self._latest.get(path) == seq:
+                del self._latest[path]
                 ready.append(path)
+        return ready
+
+    async def get_ready_batch(self, window: float = COALESCE_SECONDS) -> list[str]:
+        """Get settled changes, folding in any that settle within window.
+
+        A burst across several files often leaves their deadlines a few
+        milliseconds apart. If another change is due within window seconds,
+        wait for it so the whole burst is analyzed in a single Claude query.
+        """
+        ready = self.get_ready_changes()
+        if not ready:
             return ready
+        delay = self.get_next_deadline()
+        if delay is not None and delay <= window:
+            await asyncio.sleep(window)
+            ready.extend(self.get_ready_changes())
+        return ready
+
+
+class PathFilter:
+    """Decides which paths under a root directory should be ignored.
+
+    Combines IGNORE_PATTERNS with the root's .gitignore. Call reload()
+    when .gitignore changes so later paths are checked against the new rules.
+    """
+
+    def __init__(self, root: Path = WATCH_DIR):
+        self.root = root
+        self.gitignore_path = str(root / ".gitignore")
+        self._root_prefix = str(root) + os.sep
+        self._spec = load_gitignore_spec(root)
+
+    def reload(self) -> None:
+        """Rebuild the .gitignore matcher from disk."""
+        self._spec = load_gitignore_spec(self.root)
+
+    def should_ignore(self, path: str) -> bool:
+        """Check if path should be ignored."""
+        if _IGNORE_RE.search(path) is not None:
+            return True
+        spec = self._spec
+        if spec is None or not path.startswith(self._root_prefix):
+            return False
+        return spec.match_file(path[len(self._root_prefix):])
+
+
+# Event types FileChangeHandler acts on; everything else is dropped in dispatch()
+_HANDLED_EVENT_TYPES = frozenset({EVENT_TYPE_MODIFIED, EVENT_TYPE_CREATED})
 
 
 class FileChangeHandler(FileSystemEventHandler):
-    """Handles file system events."""
+    """Handles file system events.
 
-    def __init__(self, tracker: ChangeTracker, loop: asyncio.AbstractEventLoop):
+    Edits, atomic replacements and deletion of .gitignore reload the
+    PathFilter on the observer thread, so events that follow are filtered
+    against the new rules.
+    """
+
+    def __init__(
+        self,
+        tracker: ChangeTracker,
+        loop: asyncio.AbstractEventLoop,
+        root: Path = WATCH_DIR,
+    ):
         self.tracker = tracker
         self.loop = loop
+        self.path_filter = PathFilter(root)
 
     def _should_ignore(self, path: str) -> bool:
         """Check if path should be ignored."""
-        path_parts = Path(path).parts
-        return any(pattern in path_parts or path.endswith(pattern)
-                   for pattern in IGNORE_PATTERNS)
+        return self.path_filter.should_ignore(path)
 
-    def on_modified(self, event: FileSystemEvent):
-        if event.is_directory or self._should_ignore(str(event.src_path)):
+    def dispatch(self, event: FileSystemEvent) -> None:
+        """Drop directory and uninteresting events before per-type dispatch.
+
+        The base class calls on_any_event() and looks up a handler method
+        for every event, including the opened/closed/deleted events that
+        inotify reports each time Claude reads a file.
+
+        .gitignore is checked first, for every event type: editors that save
+        atomically rename a temp file over it (a moved event), and deleting
+        it must drop its rules too.
+        """
+        if event.is_directory:
             return
-        asyncio.run_coroutine_threadsafe(
-            self.tracker.add_change(str(event.src_path)),
-            self.loop
-        )
+        gitignore_path = self.path_filter.gitignore_path
+        if gitignore_path in (str(event.src_path), str(getattr(event, "dest_path", ""))):
+            self.path_filter.reload()
+        if event.event_type not in _HANDLED_EVENT_TYPES:
+            return
+        super().dispatch(event)
 
-    def on_created(self, event: FileSystemEvent):
-        if event.is_directory or self._should_ignore(str(event.src_path)):
+    def _handle(self, event: FileSystemEvent) -> None:
+        path = str(event.src_path)
+        if self._should_ignore(path):
             return
-        asyncio.run_coroutine_threadsafe(
-            self.tracker.add_change(str(event.src_path)),
-            self.loop
-        )
+        self.loop.call_soon_threadsafe(self.tracker.add_change, path)
+
+    def on_modified(self, event: FileSystemEvent):
+        self._handle(event)
+
+    def on_created(self, event: FileSystemEvent):
+        self._handle(event)
+
+
+class StreamPrinter:
+    """Buffers streamed text and writes it to stdout in larger pieces.
+
+    Printing every fragment with flush=True costs one write() per fragment.
+    Text is instead held until it contains a newline or reaches limit
+    characters, then written and flushed in one go.
+    """
+
+    def __init__(self, limit: int = 4096):
+        self.limit = limit
+        self._parts: list[str] = []
+        self._size = 0
+
+    def write(self, text: str) -> None:
+        self._parts.append(text)
+        self._size += len(text)
+        if self._size >= self.limit or "\n" in text:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write out any buffered text."""
+        if self._parts:
+            sys.stdout.write("".join(self._parts))
+            sys.stdout.flush()
+            self._parts.clear()
+            self._size = 0
 
 
 def get_user_approval(prompt: str) -> bool:
@@ -125,7 +342,7 @@ async def analyze_changes(changed_files: list[str]) -> None:
         changed_files: List of absolute paths to files that were modified.
 
     Side Effects:
-        - Prints analysis results to stdout
+        - Streams analysis results to stdout as they arrive
         - Prompts user for input via get_user_approval() if issues found
         - Calls apply_fixes() if user approves the suggested changes
 
@@ -148,24 +365,28 @@ If everything looks good, just say so."""
     print("🔍 Analyzing changes...")
     print(f"{'='*60}")
 
-    options = ClaudeCodeOptions(
-        allowed_tools=["Read", "Glob", "Grep"],  # Read-only for analysis
-        cwd=str(WATCH_DIR),
-    )
-
-    result_text = ""
+    # Echo text as it streams in and keep a copy for the keyword check below
+    parts: list[str] = []
+    printer = StreamPrinter()
+    print()
 
     try:
-        async for message in query(prompt=prompt, options=options):
-            result_text += extract_text_from_message(message)
+        async for message in query(prompt=prompt, options=_ANALYZE_OPTIONS):
+            text = extract_text_from_message(message)
+            if text:
+                parts.append(text)
+                printer.write(text)
     except Exception as e:
+        printer.flush()
         print(f"\n⚠️ Analysis failed: {e}. Continuing to monitor...")
         return
 
-    print(f"\n{result_text}")
+    printer.flush()
+    print()
+    result_text = "".join(parts)
 
     # Check if fixes are needed
-    if any(keyword in result_text.lower() for keyword in ["issue", "error", "bug", "fix", "problem", "should"]):
+    if _ISSUE_RE.search(result_text):
         if get_user_approval("Would you like me to apply the suggested fixes?"):
             await apply_fixes(changed_files, result_text)
         else:
@@ -205,29 +426,46 @@ Make the necessary edits to fix the issues you identified."""
     print("🔧 Applying fixes...")
     print(f"{'='*60}")
 
-    options = ClaudeCodeOptions(
-        allowed_tools=["Read", "Edit", "Write", "Glob", "Grep"],
-        cwd=str(WATCH_DIR),
-    )
+    printer = StreamPrinter()
 
     try:
-        async for message in query(prompt=prompt, options=options):
+        async for message in query(prompt=prompt, options=_FIX_OPTIONS):
             text = extract_text_from_message(message)
             if text:
-                print(text, end="", flush=True)
+                printer.write(text)
     except Exception as e:
+        printer.flush()
         print(f"\n⚠️ Applying fixes failed: {e}. Continuing to monitor...")
         return
 
+    printer.flush()
+
     print("\n✓ Fixes applied!")
 
 
+def filter_existing_files(paths: Iterable[str]) -> list[str]:
+    """Return the distinct paths that still exist as regular files.
+
+    Changed files may be deleted or renamed before they are analyzed. This
+    runs one os.path.isfile() stat per path without building Path objects.
+    """
+    return [path for path in dict.fromkeys(paths) if os.path.isfile(path)]
+
+
+def print_monitor_banner() -> None:
+    """Print the banner shown when monitoring starts."""
+    print(f"\n{'='*60}")
+    print(f"👁️  Monitoring: {WATCH_DIR}")
+    print(f"{'='*60}")
+    print("Watching for file changes... (Ctrl+C to stop)\n")
+
+
 async def monitor_loop(tracker: ChangeTracker) -> None:
     """Main monitoring loop that processes file changes.
 
-    Continuously polls the ChangeTracker for debounced file changes
-    and triggers analysis when files are ready. Runs indefinitely
-    until interrupted.
+    Sleeps until the ChangeTracker signals a new change or a debounce
+    deadline expires, then triggers analysis when files are ready.
+    Runs indefinitely until interrupted.
 
     Args:
         tracker: ChangeTracker instance collecting file system events.
@@ -235,26 +473,59 @@ async def monitor_loop(tracker: ChangeTracker) -> None:
     Side Effects:
         - Prints monitoring status to stdout
         - Calls analyze_changes() for each batch of changed files
-        - Sleeps 0.5s between polling cycles to reduce CPU usage
+        - Blocks without polling while no changes are pending
 
     Note:
         Only processes files that still exist (handles deletions gracefully).
     """
-    print(f"\n{'='*60}")
-    print(f"👁️  Monitoring: {WATCH_DIR}")
-    print(f"{'='*60}")
-    print("Watching for file changes... (Ctrl+C to stop)\n")
+    print_monitor_banner()
 
     while True:
-        ready_changes = await tracker.get_ready_changes()
+        await tracker.wait_for_changes()
+        ready_changes = await tracker.get_ready_batch()
 
         if ready_changes:
-            # Filter to only existing files
-            existing_files = [f for f in ready_changes if Path(f).exists()]
+            existing_files = filter_existing_files(ready_changes)
             if existing_files:
                 await analyze_changes(existing_files)
 
-        await asyncio.sleep(0.5)
+
+async def watchfiles_loop(path_filter: PathFilter) -> None:
+    """Monitoring loop backed by watchfiles instead of watchdog.
+
+    watchfiles collects filesystem events in Rust and yields them as one
+    set once no new change has arrived for DEBOUNCE_SECONDS, replacing the
+    Observer thread, FileChangeHandler and ChangeTracker. Used by main()
+    when the optional watchfiles package is installed.
+
+    Args:
+        path_filter: Filter applied to every reported path.
+
+    Side Effects:
+        - Prints monitoring status to stdout
+        - Calls analyze_changes() for each batch of changed files
+    """
+    from watchfiles import awatch
+
+    def watch_filter(change: object, path: str) -> bool:
+        if path == path_filter.gitignore_path:
+            path_filter.reload()
+        return not path_filter.should_ignore(path)
+
+    print_monitor_banner()
+
+    debounce_ms = int(DEBOUNCE_SECONDS * 1000)
+    async for changes in awatch(
+        path_filter.root,
+        watch_filter=watch_filter,
+        step=debounce_ms,  # Quiet period required before a batch is yielded
+        debounce=debounce_ms * 5,  # Flush continuous edits after this long
+        recursive=True,
+        ignore_permission_denied=True,  # Unreadable subdirectories aren't fatal
+    ):
+        existing_files = filter_existing_files(path for _, path in changes)
+        if existing_files:
+            await analyze_changes(existing_files)
 
 
 async def main():
@@ -266,6 +537,13 @@ async def main():
 ╚═══════════════════════════════════════════════════════════╝
     """)
 
+    if importlib.util.find_spec("watchfiles") is not None:
+        try:
+            await watchfiles_loop(PathFilter())
+        except KeyboardInterrupt:
+            print("\n\n👋 Shutting down agent...")
+        return
+
     # Set up change tracker
     tracker = ChangeTracker()
     loop = asyncio.get_event_loop()
@@ -9,16 +9,53 @@ improvements, missing tests, documentation gaps, and potential bugs.
 
 import argparse
 import asyncio
+import hashlib
+import io
 import json
+import os
+import re
+import sys
 import time
-from dataclasses import dataclass
+from collections.abc import AsyncGenerator
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field, replace
+from operator import attrgetter
 from pathlib import Path
 
-from claude_code_sdk import ClaudeCodeOptions, query
+from claude_code_sdk import ClaudeCodeOptions, ClaudeSDKClient, ResultMessage, query
+
+# orjson is an optional, faster JSON encoder; both paths emit equivalent,
+# non-ASCII-escaped JSON
+try:
+    import orjson
+
+    def _dumps(data: object) -> str:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2).decode()
+except ImportError:
+    def _dumps(data: object) -> str:
+        return json.dumps(data, indent=2, ensure_ascii=False)
 
 # Configuration
 PROJECT_DIR = Path(__file__).parent.resolve()
 IGNORE_PATTERNS = {".git", "__pycache__", "venv", ".venv", "node_modules", ".pyc", ".pyo"}
+# Tool caches rewritten by every test or lint run; scanning them would change
+# the repo fingerprint and miss the response cache without any code change
+_SCAN_IGNORE_DIRS = IGNORE_PATTERNS | {".pytest_cache", ".mypy_cache", ".ruff_cache"}
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "envision"
+# Cached responses kept in CACHE_DIR; the oldest are deleted beyond this
+CACHE_MAX_ENTRIES = 64
+
+# Model routing: small codebases and the simpler categories go to a faster,
+# cheaper model; everything else uses the Claude Code default
+FAST_MODEL = "claude-3-5-haiku-latest"
+FAST_CATEGORIES = {"documentation_gaps", "missing_tests"}
+SMALL_REPO_BYTES = 200_000
+
+# Price per million tokens: (input, output, cache read)
+_MODEL_PRICING = {
+    "haiku": (0.80, 4.0, 0.08),
+    "sonnet": (3.0, 15.0, 0.30),
+}
 
 # Analysis categories
 ANALYSIS_CATEGORIES = [
@@ -28,8 +65,38 @@ ANALYSIS_CATEGORIES = [
     "potential_bugs",
 ]
 
-
-@dataclass
+# Prompt description of each category
+_CATEGORY_FOCUS = {
+    "code_quality": "**Code Quality**: Refactoring opportunities, code smells, complexity issues",
+    "missing_tests": "**Missing Tests**: Functions/modules without adequate test coverage",
+    "documentation_gaps": "**Documentation Gaps**: Missing docstrings, unclear code, outdated comments",
+    "potential_bugs": "**Potential Bugs**: Error handling issues, edge cases, security concerns",
+}
+
+# Sort order of Improvement.priority; unknown priorities rank as medium
+_PRIORITY_RANK = {"high": 0, "medium": 1, "low": 2}
+# Priority markers for the text report and the GitHub step summary
+_PRIORITY_ICONS = {"high": "[!]", "medium": "[*]", "low": "[-]"}
+_PRIORITY_EMOJI = {"high": "🔴", "medium": "🟡", "low": "🟢"}
+
+# Response format: field header -> Improvement attribute it fills
+_FIELD_NAMES = {
+    "CATEGORY": "category",
+    "TITLE": "title",
+    "FILE": "file_path",
+    "PRIORITY": "priority",
+    "TIME_ESTIMATE": "time_estimate",
+    "DESCRIPTION": "description",
+}
+# An improvement block; a start marker without an END is skipped, not merged
+_BLOCK_RE = re.compile(
+    r"---IMPROVEMENT---((?:(?!---IMPROVEMENT---).)*?)---END---", re.DOTALL
+)
+_FIELD_RE = re.compile(r"^(" + "|".join(_FIELD_NAMES) + r"):", re.MULTILINE)
+_DIGITS_RE = re.compile(r"\d+")
+
+
+@dataclass(slots=True)
 class Improvement:
     """Represents a proposed improvement."""
     category: str
@@ -38,9 +105,14 @@ class Improvement:
     file_path: str | None
     estimated_time_minutes: int
     priority: str  # "low", "medium", "high"
+    priority_rank: int = field(init=False, repr=False, compare=False)
 
+    def __post_init__(self) -> None:
+        # Sort key, resolved once here instead of on every comparison
+        self.priority_rank = _PRIORITY_RANK.get(self.priority, 1)
 
-@dataclass
+
+@dataclass(slots=True)
 class UsageStats:
     """Claude API usage statistics."""
     input_tokens: int = 0
@@ -48,23 +120,42 @@ class UsageStats:
     cache_read_tokens: int = 0
     cache_creation_tokens: int = 0
     total_cost_usd: float = 0.0
+    model: str | None = None
 
     @property
     def total_tokens(self) -> int:
         return self.input_tokens + self.output_tokens
 
     def estimate_cost(self) -> float:
-        """Estimate cost based on token usage (Sonnet 3.5 pricing)."""
+        """Estimate cost based on token usage and the model's pricing.
+
+        Unknown or default models are priced as Sonnet.
+        """
         if self.total_cost_usd > 0:
             return self.total_cost_usd
-        # Sonnet pricing: $3/M input, $15/M output, $0.30/M cache read
-        input_cost = self.input_tokens * 0.000003
-        output_cost = self.output_tokens * 0.000015
-        cache_cost = self.cache_read_tokens * 0.0000003
-        return input_cost + output_cost + cache_cost
+        family = "haiku" if self.model and "haiku" in self.model else "sonnet"
+        input_price, output_price, cache_price = _MODEL_PRICING[family]
+        return (
+            self.input_tokens * input_price
+            + self.output_tokens * output_price
+            + self.cache_read_tokens * cache_price
+        ) / 1_000_000
+
+    def add(self, other: "UsageStats") -> None:
+        """Accumulate another run's usage into this one.
+
+        The other run's cost is added as reported, or as estimated from its
+        own model's pricing, so totals stay right when runs used different
+        models.
+        """
+        self.input_tokens += other.input_tokens
+        self.output_tokens += other.output_tokens
+        self.cache_read_tokens += other.cache_read_tokens
+        self.cache_creation_tokens += other.cache_creation_tokens
+        self.total_cost_usd += other.estimate_cost()
 
 
-@dataclass
+@dataclass(slots=True)
 class EnvisionResult:
     """Result of the envision analysis."""
     improvements: list[Improvement]
@@ -73,6 +164,14 @@ class EnvisionResult:
     usage: UsageStats | None = None
 
 
+def _positive_int(value: str) -> int:
+    """argparse type for counts that must be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
 def parse_args() -> argparse.Namespace:
     """Parse command line arguments."""
     parser = argparse.ArgumentParser(
@@ -110,21 +209,37 @@ Examples:
         default="all",
         help="Category to analyze (default: all)"
     )
+    parser.add_argument(
+        "--reuse-client",
+        action="store_true",
+        help="Keep one Claude session per agent and reuse it across categories"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always query Claude instead of reusing responses for an unchanged codebase"
+    )
+    parser.add_argument(
+        "--target-count",
+        type=_positive_int,
+        help="Improvements to ask each agent for; it stops once it has written this many "
+             "(default: 3 per category)"
+    )
+    parser.add_argument(
+        "--model",
+        help=f"Model for every category (default: {FAST_MODEL} for small codebases "
+             f"and {', '.join(sorted(FAST_CATEGORIES))}, otherwise the Claude Code default)"
+    )
     return parser.parse_args()
 
 
-def build_analysis_prompt() -> str:
-    """Build the prompt for codebase analysis."""
-    return """You are a code improvement analyst. Analyze this codebase to find opportunities for improvement.
+# Instructions shared by every analysis. They are sent as the system prompt,
+# which Claude Code marks for prompt caching, so parallel and repeated runs
+# read them from the cache instead of paying full input price each time.
+_SYSTEM_PROMPT = f"""You are a code improvement analyst. Analyze this codebase to find opportunities for improvement.
 
 IMPORTANT: This is a READ-ONLY analysis. DO NOT make any changes. Only identify and report improvements.
 
-Focus on these categories:
-1. **Code Quality**: Refactoring opportunities, code smells, complexity issues
-2. **Missing Tests**: Functions/modules without adequate test coverage
-3. **Documentation Gaps**: Missing docstrings, unclear code, outdated comments
-4. **Potential Bugs**: Error handling issues, edge cases, security concerns
-
 For each improvement you identify:
 - Keep it small and focused (max 10 minutes of work)
 - Be specific about the file and location
@@ -136,7 +251,7 @@ Start by exploring the codebase structure using Glob, then Read key files to und
 Output your findings in this exact format (one improvement per block):
 
 ---IMPROVEMENT---
-CATEGORY: <one of: code_quality, missing_tests, documentation_gaps, potential_bugs>
+CATEGORY: <one of: {', '.join(ANALYSIS_CATEGORIES)}>
 TITLE: <short descriptive title>
 FILE: <file path or "N/A" if general>
 PRIORITY: <low, medium, or high>
@@ -144,170 +259,428 @@ TIME_ESTIMATE: <number of minutes>
 DESCRIPTION: <detailed description of the improvement>
 ---END---
 
-Find 3-5 high-value improvements. Focus on practical, actionable items."""
+Focus on practical, actionable items."""
 
 
-def parse_improvements_from_response(response_text: str) -> list[Improvement]:
-    """Parse improvement blocks from Claude's response."""
-    improvements: list[Improvement] = []
+def _build_analysis_prompt(category: str, target_count: int | None = None) -> str:
+    """Build the per-run part of the analysis prompt.
 
-    # Split by improvement markers
-    blocks = response_text.split("---IMPROVEMENT---")
+    Args:
+        category: One of ANALYSIS_CATEGORIES to focus a single agent on that
+            category, or "all" to cover every category in one prompt.
+        target_count: Exact number of improvements to ask for, instead of
+            the default range.
+    """
+    categories = ANALYSIS_CATEGORIES if category == "all" else [category]
+    focus = "\n".join(
+        f"{i}. {_CATEGORY_FOCUS[c]}" for i, c in enumerate(categories, 1)
+    )
+    if target_count is not None:
+        count = str(target_count)
+    else:
+        count = "3-5" if category == "all" else "1-3"
 
-    for block in blocks[1:]:  # Skip the first split (before first marker)
-        if "---END---" not in block:
-            continue
+    if category == "all":
+        return f"""Focus on these categories:
+{focus}
 
-        content = block.split("---END---")[0].strip()
-
-        # Parse fields
-        lines = content.split("\n")
-        improvement_data: dict[str, str] = {}
-        current_field = ""
-        current_value: list[str] = []
-
-        for line in lines:
-            if line.startswith("CATEGORY:"):
-                if current_field:
-                    improvement_data[current_field] = "\n".join(current_value).strip()
-                current_field = "category"
-                current_value = [line.replace("CATEGORY:", "").strip()]
-            elif line.startswith("TITLE:"):
-                if current_field:
-                    improvement_data[current_field] = "\n".join(current_value).strip()
-                current_field = "title"
-                current_value = [line.replace("TITLE:", "").strip()]
-            elif line.startswith("FILE:"):
-                if current_field:
-                    improvement_data[current_field] = "\n".join(current_value).strip()
-                current_field = "file_path"
-                current_value = [line.replace("FILE:", "").strip()]
-            elif line.startswith("PRIORITY:"):
-                if current_field:
-                    improvement_data[current_field] = "\n".join(current_value).strip()
-                current_field = "priority"
-                current_value = [line.replace("PRIORITY:", "").strip()]
-            elif line.startswith("TIME_ESTIMATE:"):
-                if current_field:
-                    improvement_data[current_field] = "\n".join(current_value).strip()
-                current_field = "time_estimate"
-                current_value = [line.replace("TIME_ESTIMATE:", "").strip()]
-            elif line.startswith("DESCRIPTION:"):
-                if current_field:
-                    improvement_data[current_field] = "\n".join(current_value).strip()
-                current_field = "description"
-                current_value = [line.replace("DESCRIPTION:", "").strip()]
-            else:
-                current_value.append(line)
+Find {count} high-value improvements."""
+
+    return f"""Focus only on this category:
+{focus}
+
+Use CATEGORY: {category} for every improvement.
+
+Find {count} high-value improvements in this category."""
+
+
+_ANALYSIS_OPTIONS = ClaudeCodeOptions(
+    allowed_tools=["Read", "Glob", "Grep"],  # Read-only tools only
+    append_system_prompt=_SYSTEM_PROMPT,
+    cwd=str(PROJECT_DIR),
+    max_turns=20,  # Limit conversation turns
+)
+
+# Number of finished improvement blocks after which an analysis stops early,
+# matching the upper end of the range each prompt asks for
+_DEFAULT_TARGETS = {"all": 5, **dict.fromkeys(ANALYSIS_CATEGORIES, 3)}
+
+# Prompts are constant, so build every variant once at import time
+_ANALYSIS_PROMPTS = {c: _build_analysis_prompt(c) for c in [*ANALYSIS_CATEGORIES, "all"]}
+
+
+def build_analysis_prompt(category: str = "all", target_count: int | None = None) -> str:
+    """Return the prompt for codebase analysis of category (or "all")."""
+    if target_count is not None:
+        return _build_analysis_prompt(category, target_count)
+    return _ANALYSIS_PROMPTS[category]
 
-        # Don't forget the last field
-        if current_field:
-            improvement_data[current_field] = "\n".join(current_value).strip()
+
+def parse_improvements_from_response(response_text: str) -> list[Improvement]:
+    """Parse improvement blocks from Claude's response.
+
+    Blocks are located with a single regex scan, and each block is split on
+    its field headers in one more pass, so fields may appear in any order.
+    """
+    improvements: list[Improvement] = []
+
+    for block in _BLOCK_RE.finditer(response_text):
+        # split() yields [preamble, header, value, header, value, ...]
+        parts = _FIELD_RE.split(block.group(1).strip())
+        improvement_data = {
+            _FIELD_NAMES[header]: value.strip()
+            for header, value in zip(parts[1::2], parts[2::2], strict=True)
+        }
 
         # Create improvement object if we have required fields
         if all(k in improvement_data for k in ["category", "title", "description"]):
             # Parse time estimate
-            time_str = improvement_data.get("time_estimate", "10")
-            try:
-                time_minutes = int("".join(c for c in time_str if c.isdigit()) or "10")
-            except ValueError:
-                time_minutes = 10
+            digits = _DIGITS_RE.search(improvement_data.get("time_estimate", ""))
+            time_minutes = int(digits.group()) if digits else 10
 
-            file_path = improvement_data.get("file_path", "N/A")
-            if file_path.upper() == "N/A":
-                file_path = None
+            file_value = improvement_data.get("file_path", "N/A")
+            file_path = None if file_value.upper() == "N/A" else sys.intern(file_value)
 
+            # Categories, priorities and files repeat across improvements;
+            # interning keeps one copy of each and makes comparisons cheap
             improvements.append(Improvement(
-                category=improvement_data["category"].lower().replace(" ", "_"),
+                category=sys.intern(improvement_data["category"].lower().replace(" ", "_")),
                 title=improvement_data["title"],
                 description=improvement_data["description"],
                 file_path=file_path,
                 estimated_time_minutes=min(time_minutes, 10),  # Cap at 10 min
-                priority=improvement_data.get("priority", "medium").lower(),
+                priority=sys.intern(improvement_data.get("priority", "medium").lower()),
             ))
 
     return improvements
 
 
-async def run_analysis(max_time: int) -> tuple[str, int, UsageStats]:
-    """Run the Claude analysis and return the response text, file count, and usage stats."""
-    prompt = build_analysis_prompt()
+def scan_repo(root: Path = PROJECT_DIR) -> tuple[str, int]:
+    """Fingerprint the non-ignored files under root and total their size.
+
+    The fingerprint hashes the path, size and mtime of every file, so any
+    edit, addition or removal changes it without reading file contents.
+    Directories are walked with os.scandir, whose entries carry their type,
+    so only files are stat'ed and ignored directories are never opened.
+
+    Returns:
+        Tuple of (fingerprint, total size in bytes).
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    total_bytes = 0
+    prefix_len = len(str(root)) + 1
+    stack = [str(root)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+        for entry in entries:
+            name = entry.name
+            try:
+                if entry.is_dir():
+                    if name not in _SCAN_IGNORE_DIRS and not entry.is_symlink():
+                        stack.append(entry.path)
+                    continue
+                if name.endswith((".pyc", ".pyo")):
+                    continue
+                st = entry.stat()
+            except OSError:
+                continue
+            rel = entry.path[prefix_len:]
+            digest.update(f"{rel}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+            total_bytes += st.st_size
+    return digest.hexdigest(), total_bytes
+
+
+def select_model(category: str, repo_bytes: int) -> str | None:
+    """Pick the model for a category, or None for the Claude Code default."""
+    if repo_bytes < SMALL_REPO_BYTES or category in FAST_CATEGORIES:
+        return FAST_MODEL
+    return None
+
+
+def _cache_path(prompt: str, fingerprint: str, model: str | None) -> Path:
+    key = f"{fingerprint}\0{model}\0{_SYSTEM_PROMPT}\0{prompt}"
+    return CACHE_DIR / f"{hashlib.sha256(key.encode()).hexdigest()}.json"
+
+
+def load_cached_response(
+    prompt: str, fingerprint: str, model: str | None = None
+) -> tuple[str, int] | None:
+    """Return the cached (response_text, files_analyzed) for prompt, if any."""
+    try:
+        path = _cache_path(prompt, fingerprint, model)
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return data["response_text"], data["files_analyzed"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def store_cached_response(
+    prompt: str, fingerprint: str, model: str | None, text: str, files_analyzed: int
+) -> None:
+    """Save a completed analysis response; failures only cost a future cache hit."""
+    path = _cache_path(prompt, fingerprint, model)
+    tmp = path.with_suffix(".tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp.write_text(
+            json.dumps({"response_text": text, "files_analyzed": files_analyzed}),
+            encoding="utf-8",
+        )
+        os.replace(tmp, path)
+    except OSError:
+        return
+    _prune_cache()
 
-    options = ClaudeCodeOptions(
-        allowed_tools=["Read", "Glob", "Grep"],  # Read-only tools only
-        cwd=str(PROJECT_DIR),
-        max_turns=20,  # Limit conversation turns
-    )
 
-    result_text = ""
+def _prune_cache() -> None:
+    """Delete the oldest cached responses beyond CACHE_MAX_ENTRIES.
+
+    Every codebase change gives new cache keys, so without pruning the
+    entries for old fingerprints would accumulate forever.
+    """
+    try:
+        with os.scandir(CACHE_DIR) as it:
+            entries = sorted(
+                (entry.stat().st_mtime_ns, entry.path)
+                for entry in it
+                if entry.name.endswith(".json")
+            )
+        for _, path in entries[:max(len(entries) - CACHE_MAX_ENTRIES, 0)]:
+            os.unlink(path)
+    except OSError:
+        pass
+
+
+def _record_result_usage(usage: UsageStats, message: ResultMessage) -> None:
+    """Add a ResultMessage's token usage and cost to usage.
+
+    Token usage and cost are reported once per run, on the final
+    ResultMessage; assistant messages carry neither.
+    """
+    msg_usage = message.usage or {}
+    usage.input_tokens += msg_usage.get("input_tokens", 0)
+    usage.output_tokens += msg_usage.get("output_tokens", 0)
+    usage.cache_read_tokens += msg_usage.get("cache_read_input_tokens", 0)
+    usage.cache_creation_tokens += msg_usage.get("cache_creation_input_tokens", 0)
+    if message.total_cost_usd:
+        usage.total_cost_usd = float(message.total_cost_usd)
+
+
+async def run_analysis(
+    max_time: float,
+    category: str = "all",
+    client: ClaudeSDKClient | None = None,
+    model: str | None = None,
+    target_count: int | None = None,
+) -> tuple[str, int, UsageStats]:
+    """Run the Claude analysis and return the response text, file count, and usage stats.
+
+    With a connected client the prompt is sent over its existing session,
+    using the model the client was opened with; otherwise query() starts a
+    fresh Claude Code process for this run with model.
+
+    The run stops as soon as target_count improvement blocks (by default
+    the most the prompt asks for) have been written, rather than letting
+    Claude keep exploring for the rest of its turns.
+    """
+    prompt = build_analysis_prompt(category, target_count)
+    target = target_count if target_count is not None else _DEFAULT_TARGETS[category]
+    blocks_found = 0
+    stopped_early = False
+    timed_out = False
+
+    if client is None:
+        options = _ANALYSIS_OPTIONS if model is None else replace(_ANALYSIS_OPTIONS, model=model)
+        messages = query(prompt=prompt, options=options)
+    else:
+        model = client.options.model
+        await client.query(prompt)
+        messages = client.receive_response()
+
+    # Text blocks are collected and joined once rather than concatenated
+    chunks: list[str] = []
     files_analyzed = 0
     start_time = time.time()
 
-    # Track usage from messages
-    usage = UsageStats()
-    processed_message_ids: set[str] = set()
+    usage = UsageStats(model=model)
 
-    async for message in query(prompt=prompt, options=options):
-        # Check time limit
+    async for message in messages:
+        # Check time limit; a ResultMessage means the response already ended
         if time.time() - start_time > max_time:
+            if isinstance(message, ResultMessage):
+                _record_result_usage(usage, message)
+            else:
+                timed_out = True
             break
 
-        # Track usage from assistant messages (deduplicate by message ID)
-        message_id = getattr(message, "id", None)
-        if message_id and message_id not in processed_message_ids:
-            msg_usage = getattr(message, "usage", None)
-            if msg_usage:
-                processed_message_ids.add(message_id)
-                # Extract usage data (handle both dict and object)
-                if isinstance(msg_usage, dict):
-                    usage.input_tokens += msg_usage.get("input_tokens", 0)
-                    usage.output_tokens += msg_usage.get("output_tokens", 0)
-                    usage.cache_read_tokens += msg_usage.get("cache_read_input_tokens", 0)
-                    usage.cache_creation_tokens += msg_usage.get("cache_creation_input_tokens", 0)
-                else:
-                    usage.input_tokens += getattr(msg_usage, "input_tokens", 0)
-                    usage.output_tokens += getattr(msg_usage, "output_tokens", 0)
-                    usage.cache_read_tokens += getattr(msg_usage, "cache_read_input_tokens", 0)
-                    usage.cache_creation_tokens += getattr(msg_usage, "cache_creation_input_tokens", 0)
-
-        # Check for final result with total cost
-        if hasattr(message, "total_cost_usd") and message.total_cost_usd:
-            usage.total_cost_usd = float(message.total_cost_usd)
+        if isinstance(message, ResultMessage):
+            _record_result_usage(usage, message)
 
         if hasattr(message, "content"):
             if isinstance(message.content, str):
-                result_text += message.content
+                chunks.append(message.content)
             elif isinstance(message.content, list):
                 for block in message.content:
                     if hasattr(block, "text"):
-                        result_text += block.text
+                        chunks.append(block.text)
+                        # Each text block is complete, so blocks never straddle two
+                        blocks_found += len(_BLOCK_RE.findall(block.text))
                     # Count tool uses for file reading
                     if hasattr(block, "name") and block.name in ("Read", "Glob"):
                         files_analyzed += 1
         elif hasattr(message, "result") and message.result:
-            result_text = str(message.result)
-
-    return result_text, max(files_analyzed, 1), usage
+            # The final result replaces the intermediate text
+            chunks.clear()
+            chunks.append(str(message.result))
 
+        if blocks_found >= target:
+            stopped_early = True
+            break
 
-async def analyze_codebase(max_agents: int, max_time: int, category: str) -> EnvisionResult:
-    """Analyze the codebase for improvement opportunities."""
+    if client is not None and (stopped_early or timed_out):
+        # Finish the interrupted response so the session is clean for reuse;
+        # its ResultMessage still carries the run's usage and cost
+        await client.interrupt()
+        async for message in messages:
+            if isinstance(message, ResultMessage):
+                _record_result_usage(usage, message)
+    elif client is None:
+        if stopped_early:
+            # query() can't be interrupted, but the target is usually reached
+            # on the final answer, so read on to the ResultMessage with the
+            # usage while the time budget lasts
+            async for message in messages:
+                if isinstance(message, ResultMessage):
+                    _record_result_usage(usage, message)
+                    break
+                if time.time() - start_time > max_time:
+                    break
+        # Shut the Claude Code process down now rather than on garbage collection
+        if isinstance(messages, AsyncGenerator):
+            await messages.aclose()
+
+    return "".join(chunks), max(files_analyzed, 1), usage
+
+
+async def analyze_codebase(
+    max_agents: int,
+    max_time: int,
+    category: str,
+    reuse_client: bool = False,
+    use_cache: bool = True,
+    model: str | None = None,
+    target_count: int | None = None,
+) -> EnvisionResult:
+    """Analyze the codebase for improvement opportunities.
+
+    Each category is analyzed by its own agent. Up to max_agents agents run
+    concurrently, and all of them share the max_time budget. With
+    reuse_client, each agent slot keeps one connected ClaudeSDKClient and
+    runs its categories over that session instead of starting a new Claude
+    Code process per category.
+
+    With use_cache, responses are stored on disk keyed by prompt, model and
+    the scan_repo() fingerprint, and a category whose inputs are unchanged
+    since a previous run is answered without querying Claude.
+
+    Unless model is given, each category's model comes from select_model().
+    Reused clients are opened before any category runs, so they all use the
+    model chosen for the codebase as a whole. target_count is passed on to
+    run_analysis() for every category.
+    """
     start_time = time.time()
+    deadline = start_time + max_time
+    categories = ANALYSIS_CATEGORIES if category == "all" else [category]
+    fingerprint, repo_bytes = "", 0
+    if use_cache or model is None:
+        fingerprint, repo_bytes = await asyncio.to_thread(scan_repo)
+
+    def model_for(cat: str) -> str | None:
+        return model if model is not None else select_model(cat, repo_bytes)
+
+    client_model = model_for(category)
+
+    # One entry per agent slot; taking an entry doubles as the concurrency limit
+    pool: asyncio.Queue[ClaudeSDKClient | None] = asyncio.Queue()
+    # Last total_cost_usd reported by each reused client's session
+    session_costs: dict[ClaudeSDKClient, float] = {}
+
+    async def run_category(cat: str) -> tuple[str, int, UsageStats]:
+        prompt = build_analysis_prompt(cat, target_count)
+        cat_model = client_model if reuse_client else model_for(cat)
+        if use_cache:
+            cached = load_cached_response(prompt, fingerprint, cat_model)
+            if cached is not None:
+                return cached[0], cached[1], UsageStats()
+
+        client = await pool.get()
+        try:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return "", 0, UsageStats()
+            text, files, usage = await run_analysis(
+                remaining, cat, client, cat_model, target_count
+            )
+            if client is not None and usage.total_cost_usd:
+                # A session reports its running total, so keep only this run's share
+                session_cost = usage.total_cost_usd
+                usage.total_cost_usd = max(session_cost - session_costs.get(client, 0.0), 0.0)
+                session_costs[client] = session_cost
+        finally:
+            pool.put_nowait(client)
+
+        # A run cut short by the deadline may be missing improvements
+        if use_cache and text and time.time() < deadline:
+            store_cached_response(prompt, fingerprint, cat_model, text, files)
+        return text, files, usage
+
+    async with AsyncExitStack() as stack:
+        for _ in range(min(max(max_agents, 1), len(categories))):
+            client = None
+            if reuse_client:
+                client = await stack.enter_async_context(
+                    ClaudeSDKClient(options=replace(_ANALYSIS_OPTIONS, model=client_model))
+                )
+            pool.put_nowait(client)
+        outcomes = await asyncio.gather(
+            *(run_category(c) for c in categories), return_exceptions=True
+        )
 
-    # For now, run single analysis (parallel agents can be added later)
-    # max_agents is available for future parallel category analysis
-    response_text, files_analyzed, usage = await run_analysis(max_time)
+    # A failed category should not discard what the other agents found
+    results: list[tuple[str, int, UsageStats]] = []
+    errors: list[Exception] = []
+    for cat, outcome in zip(categories, outcomes, strict=True):
+        if isinstance(outcome, Exception):
+            print(f"Warning: {cat} analysis failed: {outcome}", file=sys.stderr)
+            errors.append(outcome)
+        elif isinstance(outcome, BaseException):
+            raise outcome
+        else:
+            results.append(outcome)
+    if errors and not results:
+        raise errors[0]
 
-    # Parse improvements from response
-    improvements = parse_improvements_from_response(response_text)
+    usage = UsageStats()
+    for _, _, run_usage in results:
+        usage.add(run_usage)
+    files_analyzed = sum(files for _, files, _ in results)
+
+    improvements = [
+        improvement
+        for text, _, _ in results
+        for improvement in parse_improvements_from_response(text)
+    ]
 
     # Filter by category if specified
     if category != "all":
         improvements = [i for i in improvements if i.category == category]
 
     # Sort by priority (high > medium > low)
-    priority_order = {"high": 0, "medium": 1, "low": 2}
-    improvements.sort(key=lambda x: priority_order.get(x.priority, 1))
+    improvements.sort(key=attrgetter("priority_rank"))
 
     analysis_time = time.time() - start_time
 
@@ -321,66 +694,58 @@ async def analyze_codebase(max_agents: int, max_time: int, category: str) -> Env
 
 def format_output_text(result: EnvisionResult) -> str:
     """Format the result as human-readable text."""
-    lines = [
-        "",
-        "=" * 60,
-        "  CODEBASE IMPROVEMENT PROPOSALS",
-        "=" * 60,
-        "",
-        f"Analysis completed in {result.analysis_time_seconds:.1f}s",
-        f"Files analyzed: {result.files_analyzed}",
-        f"Improvements found: {len(result.improvements)}",
-    ]
+    rule = "-" * 60
+    banner = "=" * 60
+    buf = io.StringIO()
+    w = buf.write
+
+    w(f"""
+{banner}
+  CODEBASE IMPROVEMENT PROPOSALS
+{banner}
+
+Analysis completed in {result.analysis_time_seconds:.1f}s
+Files analyzed: {result.files_analyzed}
+Improvements found: {len(result.improvements)}
+""")
 
     # Add usage stats if available
     if result.usage:
-        lines.extend([
-            "",
-            "-" * 60,
-            "  API USAGE",
-            "-" * 60,
-            f"  Input tokens:  {result.usage.input_tokens:,}",
-            f"  Output tokens: {result.usage.output_tokens:,}",
-            f"  Total tokens:  {result.usage.total_tokens:,}",
-        ])
+        w(f"""
+{rule}
+  API USAGE
+{rule}
+  Input tokens:  {result.usage.input_tokens:,}
+  Output tokens: {result.usage.output_tokens:,}
+  Total tokens:  {result.usage.total_tokens:,}
+""")
         if result.usage.cache_read_tokens > 0:
-            lines.append(f"  Cache read:    {result.usage.cache_read_tokens:,}")
-        cost = result.usage.estimate_cost()
-        lines.append(f"  Est. cost:     ${cost:.4f}")
-        lines.append("-" * 60)
+            w(f"  Cache read:    {result.usage.cache_read_tokens:,}\n")
+        w(f"  Est. cost:     ${result.usage.estimate_cost():.4f}\n{rule}\n")
 
-    lines.append("")
+    w("\n")
 
     if not result.improvements:
-        lines.append("No improvements identified. The codebase looks good!")
+        w("No improvements identified. The codebase looks good!\n")
     else:
         for i, improvement in enumerate(result.improvements, 1):
-            priority_icon = {"high": "[!]", "medium": "[*]", "low": "[-]"}.get(
-                improvement.priority, "[*]"
-            )
-            lines.extend([
-                "-" * 60,
-                f"{priority_icon} {i}. {improvement.title}",
-                f"   Category: {improvement.category.replace('_', ' ').title()}",
-                f"   Priority: {improvement.priority.upper()}",
-                f"   Estimated time: ~{improvement.estimated_time_minutes} min",
-            ])
+            priority_icon = _PRIORITY_ICONS.get(improvement.priority, "[*]")
+            w(f"""{rule}
+{priority_icon} {i}. {improvement.title}
+   Category: {improvement.category.replace('_', ' ').title()}
+   Priority: {improvement.priority.upper()}
+   Estimated time: ~{improvement.estimated_time_minutes} min
+""")
             if improvement.file_path:
-                lines.append(f"   File: {improvement.file_path}")
-            lines.extend([
-                "",
-                f"   {improvement.description}",
-                "",
-            ])
-
-    lines.extend([
-        "=" * 60,
-        "NOTE: These are proposals only. No changes have been made.",
-        "=" * 60,
-        "",
-    ])
+                w(f"   File: {improvement.file_path}\n")
+            w(f"\n   {improvement.description}\n\n")
 
-    return "\n".join(lines)
+    w(f"""{banner}
+NOTE: These are proposals only. No changes have been made.
+{banner}
+""")
+
+    return buf.getvalue()
 
 
 def format_output_json(result: EnvisionResult) -> str:
@@ -410,12 +775,23 @@ def format_output_json(result: EnvisionResult) -> str:
             "cache_read_tokens": result.usage.cache_read_tokens,
             "estimated_cost_usd": result.usage.estimate_cost(),
         }
-    return json.dumps(data, indent=2)
+    return _dumps(data)
+
+
+def _append_text(path: str, text: str) -> None:
+    try:
+        with open(path, "a") as f:
+            f.write(text)
+    except OSError:
+        pass  # Silently fail if we can't write
+
 
+async def write_github_summary(result: EnvisionResult) -> None:
+    """Write summary to GitHub Actions step summary if available.
 
-def write_github_summary(result: EnvisionResult) -> None:
-    """Write summary to GitHub Actions step summary if available."""
-    import os
+    The append runs in a worker thread so a slow step-summary file does not
+    block the event loop.
+    """
     summary_file = os.environ.get("GITHUB_STEP_SUMMARY")
     if not summary_file:
         return
@@ -453,7 +829,7 @@ def write_github_summary(result: EnvisionResult) -> None:
             "|----------|-------|----------|-----------|",
         ])
         for imp in result.improvements:
-            priority_emoji = {"high": "🔴", "medium": "🟡", "low": "🟢"}.get(imp.priority, "⚪")
+            priority_emoji = _PRIORITY_EMOJI.get(imp.priority, "⚪")
             lines.append(
                 f"| {priority_emoji} {imp.priority.upper()} | {imp.title} | "
                 f"{imp.category.replace('_', ' ').title()} | ~{imp.estimated_time_minutes} min |"
@@ -461,11 +837,7 @@ def write_github_summary(result: EnvisionResult) -> None:
     else:
         lines.append("✅ No improvements needed - codebase looks good!")
 
-    try:
-        with open(summary_file, "a") as f:
-            f.write("\n".join(lines) + "\n")
-    except OSError:
-        pass  # Silently fail if we can't write
+    await asyncio.to_thread(_append_text, summary_file, "\n".join(lines) + "\n")
 
 
 async def main() -> None:
@@ -490,6 +862,10 @@ async def main() -> None:
             max_agents=args.max_agents,
             max_time=args.max_time,
             category=args.category,
+            reuse_client=args.reuse_client,
+            use_cache=not args.no_cache,
+            model=args.model,
+            target_count=args.target_count,
         )
 
         if args.output == "json":
@@ -498,7 +874,7 @@ async def main() -> None:
             print(format_output_text(result))
 
         # Write GitHub Actions summary if running in CI
-        write_github_summary(result)
+        await write_github_summary(result)
 
     except KeyboardInterrupt:
         print("\n\nAnalysis interrupted by user.")
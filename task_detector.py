@@ -5,11 +5,160 @@ Scans TODO.md, PLAN.md, and CLAUDE.md for pending tasks and returns them
 in a structured format for automated task processing.
 """
 
+import hashlib
+import os
 import re
+import sys
+from collections.abc import Callable
+from dataclasses import dataclass
 from pathlib import Path
 
+# The patterns below run over the raw file bytes with re.MULTILINE; only the
+# captured titles are decoded. "[^\S\n]" is whitespace that never crosses a
+# line break, standing in for line.strip().
+# TODO.md in one sweep: a section header (## In Progress), a backlog/in-progress
+# task header (### [HIGH] @feature - Title) or, in In Progress only, a simple
+# header (### Title)
+_TODO_LINE_RE = re.compile(
+    rb"^[^\S\n]*(?:## [^\S\n]*(?P<section>.*\S)"
+    rb"|###(?:[^\S\n]+\[(?P<priority>\w+)\][^\S\n]+(?P<type>@\w+)"
+    rb"[^\S\n]+-[^\S\n]+(?P<title>.*?\S)"
+    rb"| (?!\[)[^\S\n]*(?P<simple>\S.*?)))[^\S\n]*$",
+    re.MULTILINE,
+)
+# Start of the next TODO.md section header, for skipping sections like
+# Completed without matching their task lines
+_NEXT_SECTION_RE = re.compile(rb"^[^\S\n]*## ", re.MULTILINE)
+# Unchecked checklist item: - [ ] Task description
+# Left unanchored so the engine can jump between "-" candidates; the caller
+# checks that the match starts its line (see _at_line_start).
+_UNCHECKED_RE = re.compile(rb"-[^\S\n]+\[[^\S\n]*\][^\S\n]+(.*\S)")
+# CLAUDE.md action item, either form in one pass:
+# "- [ ] Action item" or "TODO: Action item" (case-insensitive TODO)
+_ACTION_RE = re.compile(
+    rb"^[^\S\n]*(?:-[^\S\n]+\[[^\S\n]*\][^\S\n]+(?P<unchecked>.*?\S)"
+    rb"|TODO:[^\S\n]+(?P<todo>.*?\S))[^\S\n]*$",
+    re.MULTILINE | re.IGNORECASE,
+)
+# Sections of TODO.md that hold pending tasks
+_TODO_SECTIONS = {b"In Progress": "in_progress", b"Backlog": "backlog"}
+_IN_PROGRESS_PLACEHOLDER = b"_No tasks currently in progress_"
+
+
+def _at_line_start(content: bytes, pos: int) -> bool:
+    """Return True if only whitespace precedes pos on its line."""
+    line_start = content.rfind(b"\n", 0, pos) + 1
+    return line_start == pos or content[line_start:pos].isspace()
+
+
+def _decode(raw: bytes) -> str:
+    """Decode a captured title, trimming any non-ASCII whitespace at its ends."""
+    return raw.decode("utf-8", errors="replace").strip()
+
+
+@dataclass(slots=True, frozen=True)
+class Task:
+    """A pending task found in one of the markdown files."""
+    source: str  # "TODO.md", "PLAN.md" or "CLAUDE.md"
+    title: str
+    priority: str | None  # "HIGH", "MED", "LOW" or None
+    type: str | None  # "@feature", "@config", ... or None
+
+
+# Parsed tasks per (parser, path): the file's (mtime_ns, size), a digest of
+# its content, and the tasks found in it. Entries are kept in the order they
+# were last stored and the oldest are evicted beyond _PARSE_CACHE_MAX, so a
+# process polling many directories doesn't grow it without bound.
+_PARSE_CACHE: dict[
+    tuple[Callable, str], tuple[tuple[int, int], bytes, list[Task]]
+] = {}
+_PARSE_CACHE_MAX = 32
+
+
+def _load_tasks(path: Path | str, scan: Callable[[bytes], list[Task]]) -> list[Task]:
+    """
+    Read and scan a task file, reusing the previous result while it is unchanged.
 
-def parse_todo_md(path: Path) -> list[dict]:
+    A matching (mtime_ns, size) skips the read entirely; otherwise the content
+    digest decides, so a touch or a save without edits doesn't rescan the file.
+    Entries are keyed by the resolved path, so relative, absolute and
+    symlinked spellings of one file share a single entry.
+    Returns an empty list if the file is missing or unreadable.
+    """
+    key = (scan, os.path.realpath(path))
+    try:
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = _PARSE_CACHE.get(key)
+        if cached is not None and cached[0] == stamp:
+            tasks = cached[2]
+        else:
+            with open(path, "rb") as f:
+                content = f.read()
+            digest = hashlib.blake2b(content, digest_size=16).digest()
+            if cached is not None and cached[1] == digest:
+                tasks = cached[2]
+            else:
+                tasks = scan(content)
+            _PARSE_CACHE.pop(key, None)
+            _PARSE_CACHE[key] = (stamp, digest, tasks)
+            while len(_PARSE_CACHE) > _PARSE_CACHE_MAX:
+                del _PARSE_CACHE[next(iter(_PARSE_CACHE))]
+    except OSError:
+        return []
+
+    # Tasks are frozen; copy only the list so callers can't reorder the cache
+    return list(tasks)
+
+
+def _scan_todo(content: bytes) -> list[Task]:
+    """Extract pending tasks from the raw bytes of TODO.md."""
+    tasks: list[Task] = []
+    section = None
+
+    pos = 0
+    while (match := _TODO_LINE_RE.search(content, pos)) is not None:
+        pos = match.end()
+        if match["section"] is not None:
+            # Only In Progress and Backlog hold pending tasks; Completed and
+            # any other section are skipped whole, up to the next header
+            section = _TODO_SECTIONS.get(match["section"])
+            if section is None:
+                header = _NEXT_SECTION_RE.search(content, pos)
+                if header is None:
+                    break
+                pos = header.start()
+            continue
+
+        if section is None:
+            continue
+
+        # Skip the placeholder text
+        if section == "in_progress" and _IN_PROGRESS_PLACEHOLDER in match.group(0):
+            continue
+
+        if match["title"] is not None:
+            # Backlog task header (### [PRIORITY] @type - Title); priority and
+            # type come from a tiny vocabulary, so intern them like the sources
+            tasks.append(Task(
+                source="TODO.md",
+                title=_decode(match["title"]),
+                priority=sys.intern(match["priority"].decode().upper()),
+                type=sys.intern(match["type"].decode()),
+            ))
+        elif section == "in_progress":
+            # Simple header without priority/type
+            tasks.append(Task(
+                source="TODO.md",
+                title=_decode(match["simple"]),
+                priority=None,
+                type=None,
+            ))
+
+    return tasks
+
+
+def parse_todo_md(path: Path | str) -> list[Task]:
     """
     Parse TODO.md for uncompleted items in Backlog/In Progress sections.
 
@@ -21,94 +170,30 @@ def parse_todo_md(path: Path) -> list[dict]:
         path: Path to the TODO.md file
 
     Returns:
-        List of task dicts with source, title, priority, and type
+        List of Task records with source, title, priority, and type
     """
-    if not path.exists():
-        return []
+    return _load_tasks(path, _scan_todo)
 
-    try:
-        content = path.read_text(encoding="utf-8")
-    except OSError:
-        return []
 
-    tasks: list[dict] = []
-    lines = content.split("\n")
-
-    current_section = None
-    in_progress_placeholder = "_No tasks currently in progress_"
-
-    # Regex for backlog task headers: ### [HIGH] @feature - Title
-    backlog_task_pattern = re.compile(
-        r"^###\s+\[(\w+)\]\s+(@\w+)\s+-\s+(.+)$"
-    )
-
-    for line in lines:
-        stripped = line.strip()
-
-        # Track current section
-        if stripped.startswith("## "):
-            section_name = stripped[3:].strip()
-            if section_name == "In Progress":
-                current_section = "in_progress"
-            elif section_name == "Backlog":
-                current_section = "backlog"
-            elif section_name == "Completed":
-                current_section = "completed"
-            else:
-                current_section = section_name.lower()
-            continue
+def _scan_plan(content: bytes) -> list[Task]:
+    """Extract unchecked items from the raw bytes of PLAN.md."""
+    tasks: list[Task] = []
 
-        # Skip if we're in completed section
-        if current_section == "completed":
+    # Check for unchecked items
+    for match in _UNCHECKED_RE.finditer(content):
+        if not _at_line_start(content, match.start()):
             continue
-
-        # Check for backlog tasks (### [PRIORITY] @type - Title)
-        if current_section == "backlog":
-            match = backlog_task_pattern.match(stripped)
-            if match:
-                priority, task_type, title = match.groups()
-                tasks.append({
-                    "source": "TODO.md",
-                    "title": title.strip(),
-                    "priority": priority.upper(),
-                    "type": task_type,
-                })
-                continue
-
-        # Check for in-progress tasks
-        if current_section == "in_progress":
-            # Skip the placeholder text
-            if in_progress_placeholder in stripped:
-                continue
-
-            # Look for task headers in in_progress section
-            match = backlog_task_pattern.match(stripped)
-            if match:
-                priority, task_type, title = match.groups()
-                tasks.append({
-                    "source": "TODO.md",
-                    "title": title.strip(),
-                    "priority": priority.upper(),
-                    "type": task_type,
-                })
-                continue
-
-            # Also check for simpler formats like "- [x] Task name" or "### Task name"
-            if stripped.startswith("### ") and not stripped.startswith("### ["):
-                # Simple header without priority/type
-                title = stripped[4:].strip()
-                if title:
-                    tasks.append({
-                        "source": "TODO.md",
-                        "title": title,
-                        "priority": None,
-                        "type": None,
-                    })
+        tasks.append(Task(
+            source="PLAN.md",
+            title=_decode(match.group(1)),
+            priority=None,
+            type=None,
+        ))
 
     return tasks
 
 
-def parse_plan_md(path: Path) -> list[dict]:
+def parse_plan_md(path: Path | str) -> list[Task]:
     """
     Parse PLAN.md for unchecked items (- [ ]) in any section.
 
@@ -118,40 +203,34 @@ def parse_plan_md(path: Path) -> list[dict]:
         path: Path to the PLAN.md file
 
     Returns:
-        List of task dicts with source, title, priority (None), and type (None)
+        List of Task records with source, title, priority (None), and type (None)
     """
-    if not path.exists():
-        return []
+    return _load_tasks(path, _scan_plan)
 
-    try:
-        content = path.read_text(encoding="utf-8")
-    except OSError:
-        return []
 
-    tasks: list[dict] = []
-    lines = content.split("\n")
-
-    # Regex for unchecked items: - [ ] Task description
-    unchecked_pattern = re.compile(r"^-\s+\[\s*\]\s+(.+)$")
+def _scan_claude(content: bytes) -> list[Task]:
+    """Extract action items from the raw bytes of CLAUDE.md."""
+    # Both forms need a "]" or a "todo:" in some case. Most CLAUDE.md files
+    # have neither, and two substring checks are far cheaper than the sweep.
+    if b"]" not in content and b"todo:" not in content.lower():
+        return []
 
-    for line in lines:
-        stripped = line.strip()
+    tasks: list[Task] = []
 
-        # Check for unchecked items
-        match = unchecked_pattern.match(stripped)
-        if match:
-            title = match.group(1).strip()
-            tasks.append({
-                "source": "PLAN.md",
-                "title": title,
-                "priority": None,
-                "type": None,
-            })
+    # Look for explicit action items (uncommon in CLAUDE.md)
+    # Pattern: - [ ] Action item or TODO: Action item
+    for match in _ACTION_RE.finditer(content):
+        tasks.append(Task(
+            source="CLAUDE.md",
+            title=_decode(match["unchecked"] or match["todo"]),
+            priority=None,
+            type=None,
+        ))
 
     return tasks
 
 
-def parse_claude_md(path: Path) -> list[dict]:
+def parse_claude_md(path: Path | str) -> list[Task]:
     """
     Check CLAUDE.md for any action items.
 
@@ -165,52 +244,21 @@ def parse_claude_md(path: Path) -> list[dict]:
     Returns:
         Empty list (CLAUDE.md typically has no tasks)
     """
-    if not path.exists():
-        return []
-
-    try:
-        content = path.read_text(encoding="utf-8")
-    except OSError:
-        return []
+    return _load_tasks(path, _scan_claude)
 
-    tasks: list[dict] = []
-    lines = content.split("\n")
 
-    # Look for explicit action items (uncommon in CLAUDE.md)
-    # Pattern: - [ ] Action item or TODO: Action item
-    unchecked_pattern = re.compile(r"^-\s+\[\s*\]\s+(.+)$")
-    todo_pattern = re.compile(r"^TODO:\s+(.+)$", re.IGNORECASE)
-
-    for line in lines:
-        stripped = line.strip()
-
-        # Check for unchecked items
-        match = unchecked_pattern.match(stripped)
-        if match:
-            title = match.group(1).strip()
-            tasks.append({
-                "source": "CLAUDE.md",
-                "title": title,
-                "priority": None,
-                "type": None,
-            })
-            continue
+# Bucket index per priority; anything else (including None) sorts last
+_PRIORITY_ORDER: dict[str | None, int] = {"HIGH": 0, "MED": 1, "LOW": 2}
 
-        # Check for TODO: items
-        match = todo_pattern.match(stripped)
-        if match:
-            title = match.group(1).strip()
-            tasks.append({
-                "source": "CLAUDE.md",
-                "title": title,
-                "priority": None,
-                "type": None,
-            })
-
-    return tasks
+# Task sources in the order they are parsed
+_SOURCES = (
+    ("TODO.md", parse_todo_md),
+    ("PLAN.md", parse_plan_md),
+    ("CLAUDE.md", parse_claude_md),
+)
 
 
-def get_pending_tasks(base_dir: Path | None = None) -> list[dict]:
+def get_pending_tasks(base_dir: Path | str | None = None) -> list[Task]:
     """
     Get all pending tasks from TODO.md, PLAN.md, and CLAUDE.md.
 
@@ -219,28 +267,25 @@ def get_pending_tasks(base_dir: Path | None = None) -> list[dict]:
                   Defaults to current working directory.
 
     Returns:
-        List of task dicts, sorted by priority (HIGH > MED > LOW > None)
+        List of Task records, sorted by priority (HIGH > MED > LOW > None)
     """
     if base_dir is None:
         base_dir = Path.cwd()
 
-    base_dir = Path(base_dir)
-
-    tasks: list[dict] = []
+    # Plain string paths: the parsers only need os.stat() and open()
+    base = os.fspath(base_dir)
 
-    # Parse all source files
-    tasks.extend(parse_todo_md(base_dir / "TODO.md"))
-    tasks.extend(parse_plan_md(base_dir / "PLAN.md"))
-    tasks.extend(parse_claude_md(base_dir / "CLAUDE.md"))
+    # Parse all source files straight into priority buckets:
+    # HIGH > MED > LOW > None, stable within each bucket
+    buckets: list[list[Task]] = [[], [], [], []]
+    for filename, parser in _SOURCES:
+        for task in parser(os.path.join(base, filename)):
+            buckets[_PRIORITY_ORDER.get(task.priority, 3)].append(task)
 
-    # Sort by priority: HIGH > MED > LOW > None
-    priority_order = {"HIGH": 0, "MED": 1, "LOW": 2, None: 3}
-    tasks.sort(key=lambda t: priority_order.get(t["priority"], 3))
-
-    return tasks
+    return [task for bucket in buckets for task in bucket]
 
 
-def has_pending_tasks(base_dir: Path | None = None) -> bool:
+def has_pending_tasks(base_dir: Path | str | None = None) -> bool:
     """
     Check if there are any pending tasks in TODO.md, PLAN.md, or CLAUDE.md.
 
@@ -251,7 +296,14 @@ def has_pending_tasks(base_dir: Path | None = None) -> bool:
     Returns:
         True if there are pending tasks, False otherwise
     """
-    return len(get_pending_tasks(base_dir)) > 0
+    if base_dir is None:
+        base_dir = Path.cwd()
+
+    # Plain string paths: the parsers only need os.stat() and open()
+    base = os.fspath(base_dir)
+
+    # Stop at the first file with a task; no need to parse the rest or sort
+    return any(parser(os.path.join(base, filename)) for filename, parser in _SOURCES)
 
 
 if __name__ == "__main__":
@@ -297,11 +349,11 @@ _No tasks currently in progress_
 
         tasks = parse_todo_md(todo_path)
         assert len(tasks) == 3, f"Expected 3 tasks, got {len(tasks)}"
-        assert tasks[0]["title"] == "Add configuration file support"
-        assert tasks[0]["priority"] == "HIGH"
-        assert tasks[0]["type"] == "@config"
-        assert tasks[1]["priority"] == "MED"
-        assert tasks[2]["priority"] == "LOW"
+        assert tasks[0].title == "Add configuration file support"
+        assert tasks[0].priority == "HIGH"
+        assert tasks[0].type == "@config"
+        assert tasks[1].priority == "MED"
+        assert tasks[2].priority == "LOW"
         print(f"  PASS: Found {len(tasks)} tasks with correct priorities")
 
     # Test 2: parse_todo_md with in-progress task
@@ -331,9 +383,9 @@ _No tasks currently in progress_
 
         tasks = parse_todo_md(todo_path)
         assert len(tasks) == 2, f"Expected 2 tasks, got {len(tasks)}"
-        assert tasks[0]["title"] == "Implement file logging"
-        assert tasks[0]["priority"] == "HIGH"
-        print(f"  PASS: Found in-progress task: '{tasks[0]['title']}'")
+        assert tasks[0].title == "Implement file logging"
+        assert tasks[0].priority == "HIGH"
+        print(f"  PASS: Found in-progress task: '{tasks[0].title}'")
 
     # Test 3: parse_plan_md with unchecked items
     print("\n[Test 3] parse_plan_md - Unchecked items")
@@ -359,9 +411,9 @@ _No tasks currently in progress_
 
         tasks = parse_plan_md(plan_path)
         assert len(tasks) == 3, f"Expected 3 tasks, got {len(tasks)}"
-        assert tasks[0]["title"] == "Add configuration file support"
-        assert tasks[0]["source"] == "PLAN.md"
-        assert tasks[0]["priority"] is None
+        assert tasks[0].title == "Add configuration file support"
+        assert tasks[0].source == "PLAN.md"
+        assert tasks[0].priority is None
         print(f"  PASS: Found {len(tasks)} unchecked items")
 
     # Test 4: parse_claude_md returns empty for typical content
@@ -450,9 +502,9 @@ Context only, no tasks.
         tasks = get_pending_tasks(tmpdir)
         assert len(tasks) == 3, f"Expected 3 tasks, got {len(tasks)}"
         # Check sorting: HIGH first
-        assert tasks[0]["priority"] == "HIGH"
-        assert tasks[1]["priority"] == "LOW"
-        assert tasks[2]["priority"] is None  # PLAN.md task
+        assert tasks[0].priority == "HIGH"
+        assert tasks[1].priority == "LOW"
+        assert tasks[2].priority is None  # PLAN.md task
         print(f"  PASS: Combined {len(tasks)} tasks from all sources, sorted by priority")
 
     # Test 8: has_pending_tasks
@@ -474,9 +526,9 @@ Context only, no tasks.
     tasks = get_pending_tasks(project_dir)
     print(f"  Found {len(tasks)} pending tasks in project:")
     for i, task in enumerate(tasks[:5], 1):  # Show first 5
-        priority_str = f"[{task['priority']}]" if task['priority'] else "[---]"
-        type_str = task['type'] or "---"
-        print(f"    {i}. {priority_str} {type_str}: {task['title'][:50]}...")
+        priority_str = f"[{task.priority}]" if task.priority else "[---]"
+        type_str = task.type or "---"
+        print(f"    {i}. {priority_str} {type_str}: {task.title[:50]}...")
     if len(tasks) > 5:
         print(f"    ... and {len(tasks) - 5} more")
 
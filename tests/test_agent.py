@@ -4,14 +4,90 @@ import asyncio
 import sys
 import time
 from pathlib import Path
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 import pytest
+from claude_code_sdk import (
+    AssistantMessage,
+    ResultMessage,
+    SystemMessage,
+    TextBlock,
+    ToolUseBlock,
+    UserMessage,
+)
+from watchdog.events import (
+    DirModifiedEvent,
+    FileClosedEvent,
+    FileDeletedEvent,
+    FileModifiedEvent,
+    FileMovedEvent,
+    FileOpenedEvent,
+)
 
 # Import from agent module
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from agent import DEBOUNCE_SECONDS, IGNORE_PATTERNS, ChangeTracker, FileChangeHandler
+import agent
+from agent import (
+    DEBOUNCE_SECONDS,
+    IGNORE_PATTERNS,
+    ChangeTracker,
+    FileChangeHandler,
+    StreamPrinter,
+    extract_text_from_message,
+    filter_existing_files,
+)
+
+
+def make_result_message(result: str | None) -> ResultMessage:
+    """Build a ResultMessage with placeholder metadata."""
+    return ResultMessage(
+        subtype="success",
+        duration_ms=1,
+        duration_api_ms=1,
+        is_error=False,
+        num_turns=1,
+        session_id="session",
+        result=result,
+    )
+
+
+class TestExtractTextFromMessage:
+    """Tests for extract_text_from_message."""
+
+    def test_assistant_message_joins_text_blocks(self):
+        """Test that only text blocks of an assistant message are returned."""
+        message = AssistantMessage(
+            content=[
+                TextBlock(text="Looks "),
+                ToolUseBlock(id="1", name="Read", input={}),
+                TextBlock(text="good"),
+            ],
+            model="model",
+        )
+        assert extract_text_from_message(message) == "Looks good"
+
+    def test_user_message_string_content(self):
+        """Test that string content is returned as-is."""
+        assert extract_text_from_message(UserMessage(content="hello")) == "hello"
+
+    def test_user_message_block_content(self):
+        """Test that text blocks in a user message are joined."""
+        message = UserMessage(content=[TextBlock(text="a"), TextBlock(text="b")])
+        assert extract_text_from_message(message) == "ab"
+
+    def test_result_message(self):
+        """Test that the final result text is returned."""
+        assert extract_text_from_message(make_result_message("done")) == "done"
+
+    def test_result_message_without_result(self):
+        """Test that an empty result yields an empty string."""
+        assert extract_text_from_message(make_result_message(None)) == ""
+
+    def test_message_without_text(self):
+        """Test that messages without content or result yield an empty string."""
+        message = SystemMessage(subtype="init", data={})
+        assert extract_text_from_message(message) == ""
 
 
 class TestChangeTracker:
@@ -22,60 +98,119 @@ class TestChangeTracker:
         """Create a fresh ChangeTracker for each test."""
         return ChangeTracker()
 
-    @pytest.mark.asyncio
-    async def test_add_change_stores_path(self, tracker):
+    def test_add_change_stores_path(self, tracker):
         """Test that add_change stores the file path."""
-        await tracker.add_change("/path/to/file.py")
-        assert "/path/to/file.py" in tracker.pending_changes
-
-    @pytest.mark.asyncio
-    async def test_add_change_updates_timestamp(self, tracker):
-        """Test that adding the same path updates its timestamp."""
-        await tracker.add_change("/path/to/file.py")
-        first_time = tracker.pending_changes["/path/to/file.py"]
+        tracker.add_change("/path/to/file.py")
+        assert "/path/to/file.py" in tracker
 
-        await asyncio.sleep(0.01)
-        await tracker.add_change("/path/to/file.py")
-        second_time = tracker.pending_changes["/path/to/file.py"]
+    def test_add_change_updates_timestamp(self, tracker):
+        """Test that adding the same path again restarts its debounce period."""
+        with patch("agent.time.monotonic", return_value=time.monotonic() - DEBOUNCE_SECONDS - 1):
+            tracker.add_change("/path/to/file.py")
+        tracker.add_change("/path/to/file.py")
 
-        assert second_time > first_time
+        ready = tracker.get_ready_changes()
+        assert ready == []
+        assert "/path/to/file.py" in tracker
 
-    @pytest.mark.asyncio
-    async def test_get_ready_changes_respects_debounce(self, tracker):
+    def test_get_ready_changes_respects_debounce(self, tracker):
         """Test that changes aren't returned before debounce period."""
-        await tracker.add_change("/path/to/file.py")
+        tracker.add_change("/path/to/file.py")
 
         # Should be empty immediately (debounce not elapsed)
-        ready = await tracker.get_ready_changes()
+        ready = tracker.get_ready_changes()
         assert ready == []
 
-    @pytest.mark.asyncio
-    async def test_get_ready_changes_returns_after_debounce(self, tracker):
+    def test_get_ready_changes_returns_after_debounce(self, tracker):
         """Test that changes are returned after debounce period."""
-        # Manually set an old timestamp
-        tracker.pending_changes["/path/to/file.py"] = time.time() - DEBOUNCE_SECONDS - 1
+        tracker.add_change("/path/to/file.py")
 
-        ready = await tracker.get_ready_changes()
+        with patch("agent.time.monotonic", return_value=time.monotonic() + DEBOUNCE_SECONDS + 1):
+            ready = tracker.get_ready_changes()
         assert "/path/to/file.py" in ready
 
-    @pytest.mark.asyncio
-    async def test_get_ready_changes_removes_returned_items(self, tracker):
+    def test_get_ready_changes_removes_returned_items(self, tracker):
         """Test that returned changes are removed from pending."""
-        tracker.pending_changes["/path/to/file.py"] = time.time() - DEBOUNCE_SECONDS - 1
+        tracker.add_change("/path/to/file.py")
 
-        await tracker.get_ready_changes()
+        with patch("agent.time.monotonic", return_value=time.monotonic() + DEBOUNCE_SECONDS + 1):
+            tracker.get_ready_changes()
 
-        assert "/path/to/file.py" not in tracker.pending_changes
+        assert "/path/to/file.py" not in tracker
 
-    @pytest.mark.asyncio
-    async def test_multiple_changes_tracked_separately(self, tracker):
+    def test_repeated_change_returned_once(self, tracker):
+        """Test that a path changed several times is only reported once."""
+        for _ in range(3):
+            tracker.add_change("/path/to/file.py")
+
+        with patch("agent.time.monotonic", return_value=time.monotonic() + DEBOUNCE_SECONDS + 1):
+            ready = tracker.get_ready_changes()
+        assert ready == ["/path/to/file.py"]
+
+    def test_multiple_changes_tracked_separately(self, tracker):
         """Test that multiple files are tracked independently."""
-        await tracker.add_change("/path/to/file1.py")
-        await tracker.add_change("/path/to/file2.py")
+        tracker.add_change("/path/to/file1.py")
+        tracker.add_change("/path/to/file2.py")
+
+        assert len(tracker) == 2
+        assert "/path/to/file1.py" in tracker
+        assert "/path/to/file2.py" in tracker
+
+    def test_next_deadline_is_none_when_idle(self, tracker):
+        """Test that an empty tracker has no deadline to wait for."""
+        assert tracker.get_next_deadline() is None
+
+    def test_next_deadline_tracks_oldest_change(self, tracker):
+        """Test that the deadline is the debounce period after the oldest change."""
+        tracker.add_change("/path/to/file.py")
+
+        delay = tracker.get_next_deadline()
+        assert delay is not None
+        assert 0 < delay <= DEBOUNCE_SECONDS
+
+    @pytest.mark.asyncio
+    async def test_wait_for_changes_wakes_on_add(self, tracker):
+        """Test that an idle wait returns as soon as a change arrives."""
+        waiter = asyncio.create_task(tracker.wait_for_changes())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+
+        tracker.add_change("/path/to/file.py")
+        await asyncio.wait_for(waiter, timeout=1.0)
+
+    @pytest.mark.asyncio
+    async def test_wait_for_changes_returns_at_deadline(self, tracker):
+        """Test that waiting returns once an overdue change has settled."""
+        with patch("agent.time.monotonic", return_value=time.monotonic() - DEBOUNCE_SECONDS - 1):
+            tracker.add_change("/path/to/file.py")
+        tracker._wake.clear()
 
-        assert len(tracker.pending_changes) == 2
-        assert "/path/to/file1.py" in tracker.pending_changes
-        assert "/path/to/file2.py" in tracker.pending_changes
+        await asyncio.wait_for(tracker.wait_for_changes(), timeout=1.0)
+
+    @pytest.mark.asyncio
+    async def test_ready_batch_folds_in_nearly_ready_changes(self, tracker, monkeypatch):
+        """Test that a change settling within the window joins the batch."""
+        monkeypatch.setattr(agent, "DEBOUNCE_SECONDS", 0.05)
+        tracker.add_change("/path/to/file1.py")
+        await asyncio.sleep(0.03)
+        tracker.add_change("/path/to/file2.py")
+        await asyncio.sleep(0.03)
+
+        ready = await tracker.get_ready_batch(window=0.2)
+        assert ready == ["/path/to/file1.py", "/path/to/file2.py"]
+
+    @pytest.mark.asyncio
+    async def test_ready_batch_does_not_wait_for_distant_changes(self, tracker, monkeypatch):
+        """Test that changes due after the window are left for a later batch."""
+        monkeypatch.setattr(agent, "DEBOUNCE_SECONDS", 0.05)
+        tracker.add_change("/path/to/file1.py")
+        await asyncio.sleep(0.06)
+        monkeypatch.setattr(agent, "DEBOUNCE_SECONDS", 5.0)
+        tracker.add_change("/path/to/file2.py")
+
+        ready = await asyncio.wait_for(tracker.get_ready_batch(window=0.2), timeout=0.1)
+        assert ready == ["/path/to/file1.py"]
+        assert "/path/to/file2.py" in tracker
 
 
 class TestFileChangeHandler:
@@ -88,6 +223,34 @@ class TestFileChangeHandler:
         loop = MagicMock()
         return FileChangeHandler(tracker, loop)
 
+    def test_on_modified_schedules_change_on_loop(self, handler):
+        """Test that events are handed to the loop thread without a coroutine."""
+        event = MagicMock(is_directory=False, src_path="/project/agent.py")
+        handler.on_modified(event)
+        handler.loop.call_soon_threadsafe.assert_called_once_with(
+            handler.tracker.add_change, "/project/agent.py"
+        )
+
+    def test_on_created_skips_ignored_paths(self, handler):
+        """Test that ignored paths never reach the event loop."""
+        event = MagicMock(is_directory=False, src_path="/project/.git/index")
+        handler.on_created(event)
+        handler.loop.call_soon_threadsafe.assert_not_called()
+
+    def test_dispatch_routes_file_modifications(self, handler):
+        """Test that dispatch still delivers file modification events."""
+        handler.dispatch(FileModifiedEvent("/project/agent.py"))
+        handler.loop.call_soon_threadsafe.assert_called_once_with(
+            handler.tracker.add_change, "/project/agent.py"
+        )
+
+    def test_dispatch_drops_directory_and_unhandled_events(self, handler):
+        """Test that directory and open/close events never reach a handler."""
+        handler.dispatch(DirModifiedEvent("/project/src"))
+        handler.dispatch(FileOpenedEvent("/project/agent.py"))
+        handler.dispatch(FileClosedEvent("/project/agent.py"))
+        handler.loop.call_soon_threadsafe.assert_not_called()
+
     def test_should_ignore_git_directory(self, handler):
         """Test that .git paths are ignored."""
         assert handler._should_ignore("/project/.git/config") is True
@@ -120,6 +283,151 @@ class TestFileChangeHandler:
         assert handler._should_ignore("/project/README.md") is False
         assert handler._should_ignore("/project/config.yaml") is False
 
+    def test_should_not_ignore_partial_component_match(self, handler):
+        """Test that names merely containing a pattern are not ignored."""
+        assert handler._should_ignore("/project/venv_tools/setup.py") is False
+        assert handler._should_ignore("/project/.github/workflows/ci.yml") is False
+        assert handler._should_ignore("/project/module.pyc.md") is False
+
+    def test_should_ignore_gitignored_paths(self, tmp_path):
+        """Test that paths matched by the root .gitignore are ignored."""
+        (tmp_path / ".gitignore").write_text("dist/\n*.log\n")
+        handler = FileChangeHandler(MagicMock(), MagicMock(), root=tmp_path)
+
+        assert handler._should_ignore(str(tmp_path / "dist" / "bundle.js")) is True
+        assert handler._should_ignore(str(tmp_path / "logs" / "agent.log")) is True
+        assert handler._should_ignore(str(tmp_path / "src" / "main.py")) is False
+
+    def test_gitignore_change_reloads_matcher(self, tmp_path):
+        """Test that editing .gitignore takes effect for later events."""
+        gitignore = tmp_path / ".gitignore"
+        gitignore.write_text("")
+        handler = FileChangeHandler(MagicMock(), MagicMock(), root=tmp_path)
+        build_file = str(tmp_path / "build" / "out.txt")
+        assert handler._should_ignore(build_file) is False
+
+        gitignore.write_text("build/\n")
+        handler.dispatch(FileModifiedEvent(str(gitignore)))
+
+        assert handler._should_ignore(build_file) is True
+
+    def test_gitignore_atomic_replace_reloads_matcher(self, tmp_path):
+        """Test that renaming a temp file over .gitignore takes effect."""
+        gitignore = tmp_path / ".gitignore"
+        gitignore.write_text("")
+        handler = FileChangeHandler(MagicMock(), MagicMock(), root=tmp_path)
+        build_file = str(tmp_path / "build" / "out.txt")
+
+        temp = tmp_path / ".gitignore.swp"
+        temp.write_text("build/\n")
+        temp.replace(gitignore)
+        handler.dispatch(FileMovedEvent(str(temp), str(gitignore)))
+
+        assert handler._should_ignore(build_file) is True
+
+    def test_gitignore_deletion_reloads_matcher(self, tmp_path):
+        """Test that deleting .gitignore drops its rules."""
+        gitignore = tmp_path / ".gitignore"
+        gitignore.write_text("build/\n")
+        handler = FileChangeHandler(MagicMock(), MagicMock(), root=tmp_path)
+        build_file = str(tmp_path / "build" / "out.txt")
+        assert handler._should_ignore(build_file) is True
+
+        gitignore.unlink()
+        handler.dispatch(FileDeletedEvent(str(gitignore)))
+
+        assert handler._should_ignore(build_file) is False
+
+    def test_missing_gitignore_ignores_nothing_extra(self, tmp_path):
+        """Test that a root without .gitignore only uses IGNORE_PATTERNS."""
+        handler = FileChangeHandler(MagicMock(), MagicMock(), root=tmp_path)
+        assert handler._should_ignore(str(tmp_path / "dist" / "bundle.js")) is False
+
+
+class TestFilterExistingFiles:
+    """Tests for filter_existing_files."""
+
+    def test_keeps_existing_files_in_order(self, tmp_path):
+        """Test that deleted paths and directories are dropped."""
+        first = tmp_path / "b.py"
+        second = tmp_path / "a.py"
+        first.write_text("")
+        second.write_text("")
+        paths = [str(first), str(tmp_path / "deleted.py"), str(tmp_path), str(second)]
+
+        assert filter_existing_files(paths) == [str(first), str(second)]
+
+    def test_removes_duplicates(self, tmp_path):
+        """Test that a path reported twice is only returned once."""
+        path = tmp_path / "a.py"
+        path.write_text("")
+
+        assert filter_existing_files([str(path), str(path)]) == [str(path)]
+
+
+class TestStreamPrinter:
+    """Tests for StreamPrinter buffering."""
+
+    def test_holds_partial_lines(self, capsys):
+        """Test that text without a newline stays buffered."""
+        printer = StreamPrinter()
+        printer.write("partial ")
+        printer.write("line")
+        assert capsys.readouterr().out == ""
+
+        printer.flush()
+        assert capsys.readouterr().out == "partial line"
+
+    def test_writes_on_newline(self, capsys):
+        """Test that a fragment containing a newline flushes the buffer."""
+        printer = StreamPrinter()
+        printer.write("first ")
+        printer.write("line\nsecond")
+        assert capsys.readouterr().out == "first line\nsecond"
+
+    def test_writes_when_limit_reached(self, capsys):
+        """Test that long runs without newlines are written at the limit."""
+        printer = StreamPrinter(limit=8)
+        printer.write("abcd")
+        assert capsys.readouterr().out == ""
+        printer.write("efgh")
+        assert capsys.readouterr().out == "abcdefgh"
+
+
+class TestWatchfilesLoop:
+    """Tests for the optional watchfiles-backed monitoring loop."""
+
+    @pytest.mark.asyncio
+    async def test_analyzes_existing_unignored_files(self, tmp_path, monkeypatch):
+        """Test that each batch is filtered before being analyzed."""
+        watchfiles = pytest.importorskip("watchfiles")
+        source = tmp_path / "main.py"
+        source.write_text("print('hi')\n")
+        batches = [{
+            (watchfiles.Change.modified, str(source)),
+            (watchfiles.Change.deleted, str(tmp_path / "gone.py")),
+        }]
+
+        awatch_kwargs = {}
+
+        async def fake_awatch(root, watch_filter, **kwargs):
+            awatch_kwargs.update(kwargs)
+            for batch in batches:
+                yield {(c, p) for c, p in batch if watch_filter(c, p)}
+
+        analyzed = []
+
+        async def fake_analyze(files):
+            analyzed.append(files)
+
+        monkeypatch.setattr(watchfiles, "awatch", fake_awatch)
+        monkeypatch.setattr(agent, "analyze_changes", fake_analyze)
+
+        await agent.watchfiles_loop(agent.PathFilter(tmp_path))
+
+        assert analyzed == [[str(source)]]
+        assert awatch_kwargs["ignore_permission_denied"] is True
+
 
 class TestIgnorePatterns:
     """Tests for the IGNORE_PATTERNS configuration."""
@@ -0,0 +1,895 @@
+"""Tests for the Envision codebase analyzer."""
+
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from claude_code_sdk import AssistantMessage, ResultMessage, TextBlock, ToolUseBlock
+
+# Import from envision module
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import envision
+from envision import (
+    ANALYSIS_CATEGORIES,
+    EnvisionResult,
+    Improvement,
+    UsageStats,
+    analyze_codebase,
+    build_analysis_prompt,
+    format_output_json,
+    format_output_text,
+    parse_improvements_from_response,
+    scan_repo,
+    select_model,
+    write_github_summary,
+)
+
+SAMPLE_RESPONSE = """I explored the codebase and found the following.
+
+---IMPROVEMENT---
+CATEGORY: code_quality
+TITLE: Extract duplicated event handling
+FILE: agent.py
+PRIORITY: high
+TIME_ESTIMATE: 5 minutes
+DESCRIPTION: on_modified and on_created share the same body.
+
+Move it into a helper.
+---END---
+
+---IMPROVEMENT---
+CATEGORY: Missing Tests
+TITLE: Test envision output formatting
+FILE: N/A
+PRIORITY: low
+TIME_ESTIMATE: 45
+DESCRIPTION: format_output_text has no tests.
+---END---
+"""
+
+
+class TestParseImprovementsFromResponse:
+    """Tests for parse_improvements_from_response."""
+
+    def test_parses_all_blocks(self):
+        """Test that every complete block becomes an Improvement."""
+        improvements = parse_improvements_from_response(SAMPLE_RESPONSE)
+
+        assert len(improvements) == 2
+        first = improvements[0]
+        assert first.category == "code_quality"
+        assert first.title == "Extract duplicated event handling"
+        assert first.file_path == "agent.py"
+        assert first.priority == "high"
+        assert first.estimated_time_minutes == 5
+
+    def test_multiline_description(self):
+        """Test that description lines after the header are kept."""
+        improvements = parse_improvements_from_response(SAMPLE_RESPONSE)
+
+        assert improvements[0].description == (
+            "on_modified and on_created share the same body.\n\nMove it into a helper."
+        )
+
+    def test_category_normalized_and_na_file(self):
+        """Test category normalization and N/A file handling."""
+        improvement = parse_improvements_from_response(SAMPLE_RESPONSE)[1]
+
+        assert improvement.category == "missing_tests"
+        assert improvement.file_path is None
+
+    def test_time_estimate_capped(self):
+        """Test that time estimates are capped at 10 minutes."""
+        improvement = parse_improvements_from_response(SAMPLE_RESPONSE)[1]
+        assert improvement.estimated_time_minutes == 10
+
+    def test_time_estimate_uses_first_number(self):
+        """Test that a range is read as its lower bound, not concatenated digits."""
+        response = make_block("code_quality", "Range").replace(
+            "TIME_ESTIMATE: 5", "TIME_ESTIMATE: 2-3 minutes"
+        )
+        assert parse_improvements_from_response(response)[0].estimated_time_minutes == 2
+
+    def test_fields_in_any_order(self):
+        """Test that fields are matched by header, not position."""
+        response = """---IMPROVEMENT---
+DESCRIPTION: Body first
+TITLE: Reordered
+CATEGORY: potential_bugs
+---END---"""
+        improvements = parse_improvements_from_response(response)
+
+        assert len(improvements) == 1
+        assert improvements[0].title == "Reordered"
+        assert improvements[0].description == "Body first"
+        assert improvements[0].priority == "medium"
+        assert improvements[0].estimated_time_minutes == 10
+
+    def test_missing_required_field_skipped(self):
+        """Test that blocks without a description are skipped."""
+        response = """---IMPROVEMENT---
+CATEGORY: code_quality
+TITLE: No description
+---END---"""
+        assert parse_improvements_from_response(response) == []
+
+    def test_unterminated_block_not_merged_into_next(self):
+        """Test that a block missing ---END--- does not swallow the next one."""
+        response = """---IMPROVEMENT---
+CATEGORY: code_quality
+TITLE: Unterminated
+---IMPROVEMENT---
+CATEGORY: potential_bugs
+TITLE: Complete
+DESCRIPTION: Parsed on its own
+---END---"""
+        improvements = parse_improvements_from_response(response)
+
+        assert len(improvements) == 1
+        assert improvements[0].title == "Complete"
+        assert improvements[0].category == "potential_bugs"
+
+    def test_repeated_values_are_shared(self):
+        """Test that category and priority strings are interned."""
+        response = make_block("code_quality", "One") + make_block("code_quality", "Two")
+        first, second = parse_improvements_from_response(response)
+
+        assert first.category is second.category
+        assert first.priority is second.priority
+
+    def test_priority_rank(self):
+        """Test that the sort rank follows priority, with unknowns as medium."""
+        ranks = {
+            priority: Improvement("c", "t", "d", None, 1, priority).priority_rank
+            for priority in ["high", "medium", "low", "urgent"]
+        }
+        assert ranks == {"high": 0, "medium": 1, "low": 2, "urgent": 1}
+
+    def test_no_blocks(self):
+        """Test that a response without markers yields no improvements."""
+        assert parse_improvements_from_response("The codebase looks good!") == []
+
+
+def make_block(category: str, title: str, priority: str = "medium") -> str:
+    """Build one response block in the format the prompt asks for."""
+    return f"""---IMPROVEMENT---
+CATEGORY: {category}
+TITLE: {title}
+FILE: N/A
+PRIORITY: {priority}
+TIME_ESTIMATE: 5
+DESCRIPTION: Improve {title}
+---END---"""
+
+
+class TestBuildAnalysisPrompt:
+    """Tests for build_analysis_prompt."""
+
+    def test_all_lists_every_category(self):
+        """Test that the combined prompt mentions every category."""
+        prompt = build_analysis_prompt("all")
+        for category in ANALYSIS_CATEGORIES:
+            assert envision._CATEGORY_FOCUS[category] in prompt
+            assert category in envision._ANALYSIS_OPTIONS.append_system_prompt
+
+    def test_single_category_prompt(self):
+        """Test that a category prompt pins the CATEGORY field."""
+        prompt = build_analysis_prompt("missing_tests")
+        assert "CATEGORY: missing_tests " in prompt
+        assert "Code Quality" not in prompt
+
+    def test_shared_instructions_in_system_prompt(self):
+        """Test that the response format is sent once as the system prompt."""
+        options = envision._ANALYSIS_OPTIONS
+        assert "---IMPROVEMENT---" in options.append_system_prompt
+        for category in [*ANALYSIS_CATEGORIES, "all"]:
+            assert "---IMPROVEMENT---" not in build_analysis_prompt(category)
+
+
+def make_result_message(result: str | None, **kwargs) -> ResultMessage:
+    """Build a ResultMessage with placeholder metadata."""
+    return ResultMessage(
+        subtype="success",
+        duration_ms=1,
+        duration_api_ms=1,
+        is_error=False,
+        num_turns=1,
+        session_id="session",
+        result=result,
+        **kwargs,
+    )
+
+
+def fake_query(*messages):
+    """Return a stand-in for query() that yields messages."""
+
+    async def query(prompt, options):
+        for message in messages:
+            yield message
+
+    return query
+
+
+class TestRunAnalysis:
+    """Tests for run_analysis message handling."""
+
+    @pytest.mark.asyncio
+    async def test_collects_text_and_counts_file_tools(self, monkeypatch):
+        """Test that text blocks are joined and Read/Glob calls counted."""
+        monkeypatch.setattr(envision, "query", fake_query(
+            AssistantMessage(
+                content=[
+                    TextBlock(text="Looking "),
+                    ToolUseBlock(id="1", name="Glob", input={}),
+                    ToolUseBlock(id="2", name="Read", input={}),
+                ],
+                model="model",
+            ),
+            AssistantMessage(content=[TextBlock(text="around")], model="model"),
+        ))
+
+        text, files, _ = await envision.run_analysis(60, "code_quality")
+
+        assert text == "Looking around"
+        assert files == 2
+
+    @pytest.mark.asyncio
+    async def test_result_replaces_intermediate_text(self, monkeypatch):
+        """Test that the final result is returned instead of earlier turns."""
+        monkeypatch.setattr(envision, "query", fake_query(
+            AssistantMessage(content=[TextBlock(text="Exploring")], model="model"),
+            make_result_message(make_block("code_quality", "Final")),
+        ))
+
+        text, _, _ = await envision.run_analysis(60, "code_quality")
+
+        assert text == make_block("code_quality", "Final")
+
+    @pytest.mark.asyncio
+    async def test_usage_read_from_result_message(self, monkeypatch):
+        """Test that token usage and cost come from the final ResultMessage."""
+        monkeypatch.setattr(envision, "query", fake_query(
+            AssistantMessage(content=[TextBlock(text="Exploring")], model="model"),
+            make_result_message(
+                "done",
+                total_cost_usd=0.42,
+                usage={
+                    "input_tokens": 100,
+                    "output_tokens": 20,
+                    "cache_read_input_tokens": 900,
+                    "cache_creation_input_tokens": 50,
+                },
+            ),
+        ))
+
+        _, _, usage = await envision.run_analysis(60, "code_quality")
+
+        assert usage.input_tokens == 100
+        assert usage.output_tokens == 20
+        assert usage.cache_read_tokens == 900
+        assert usage.cache_creation_tokens == 50
+        assert usage.total_cost_usd == 0.42
+
+    @pytest.mark.asyncio
+    async def test_stops_once_target_reached(self, monkeypatch):
+        """Test that the stream is closed after enough blocks are written."""
+        consumed = []
+        closed = []
+
+        async def query(prompt, options):
+            try:
+                for title in ["One", "Two", "Three", "Four"]:
+                    consumed.append(title)
+                    yield AssistantMessage(
+                        content=[TextBlock(text=make_block("code_quality", title))],
+                        model="model",
+                    )
+            finally:
+                closed.append(True)
+
+        monkeypatch.setattr(envision, "query", query)
+
+        text, _, _ = await envision.run_analysis(60, "code_quality", target_count=2)
+
+        # The rest is read looking for the ResultMessage, but not kept
+        assert consumed == ["One", "Two", "Three", "Four"]
+        assert closed == [True]
+        assert [i.title for i in parse_improvements_from_response(text)] == ["One", "Two"]
+
+    @pytest.mark.asyncio
+    async def test_early_stop_keeps_usage(self, monkeypatch):
+        """Test that usage and cost survive a stop on the final answer."""
+        monkeypatch.setattr(envision, "query", fake_query(
+            AssistantMessage(content=[TextBlock(text="Exploring")], model="model"),
+            AssistantMessage(
+                content=[TextBlock(text=make_block("code_quality", t)) for t in "ABC"],
+                model="model",
+            ),
+            AssistantMessage(content=[TextBlock(text="Summary")], model="model"),
+            make_result_message(
+                "done",
+                total_cost_usd=0.37,
+                usage={"input_tokens": 100, "output_tokens": 20},
+            ),
+        ))
+
+        text, _, usage = await envision.run_analysis(60, "code_quality")
+
+        assert len(parse_improvements_from_response(text)) == 3
+        assert "Summary" not in text
+        assert usage.input_tokens == 100
+        assert usage.output_tokens == 20
+        assert usage.total_cost_usd == 0.37
+
+    @pytest.mark.asyncio
+    async def test_early_stop_gives_up_after_time_limit(self, monkeypatch):
+        """Test that reading on to the ResultMessage stops at the time limit."""
+        consumed = []
+        clock = iter(range(100))
+
+        async def query(prompt, options):
+            yield AssistantMessage(
+                content=[TextBlock(text=make_block("code_quality", "Only"))], model="model"
+            )
+            for title in ["Two", "Three", "Four"]:
+                consumed.append(title)
+                yield AssistantMessage(content=[TextBlock(text=title)], model="model")
+
+        monkeypatch.setattr(envision, "query", query)
+        monkeypatch.setattr(envision.time, "time", lambda: next(clock))
+
+        await envision.run_analysis(2.5, "code_quality", target_count=1)
+
+        assert consumed == ["Two", "Three"]
+
+    @pytest.mark.asyncio
+    async def test_early_stop_drains_reused_client(self):
+        """Test that a reused session is interrupted and drained after stopping."""
+        block = AssistantMessage(
+            content=[TextBlock(text=make_block("code_quality", "Only"))], model="model"
+        )
+
+        class FakeClient:
+            options = envision._ANALYSIS_OPTIONS
+
+            def __init__(self):
+                self.interrupted = False
+                self.drained = False
+
+            async def query(self, prompt):
+                pass
+
+            async def receive_response(self):
+                yield block
+                yield AssistantMessage(content=[TextBlock(text="more")], model="model")
+                self.drained = True
+                yield make_result_message(
+                    "done", total_cost_usd=0.37, usage={"input_tokens": 100}
+                )
+
+            async def interrupt(self):
+                self.interrupted = True
+
+        client = FakeClient()
+        text, _, usage = await envision.run_analysis(
+            60, "code_quality", client=client, target_count=1
+        )
+
+        assert client.interrupted and client.drained
+        assert "more" not in text
+        assert usage.input_tokens == 100
+        assert usage.total_cost_usd == 0.37
+
+    @pytest.mark.asyncio
+    async def test_time_limit_drains_reused_client(self):
+        """Test that a reused session is interrupted and drained on timeout."""
+
+        class FakeClient:
+            options = envision._ANALYSIS_OPTIONS
+
+            def __init__(self):
+                self.interrupted = False
+                self.drained = False
+
+            async def query(self, prompt):
+                pass
+
+            async def receive_response(self):
+                yield AssistantMessage(content=[TextBlock(text="Exploring")], model="model")
+                yield AssistantMessage(content=[TextBlock(text="more")], model="model")
+                self.drained = True
+                yield make_result_message(
+                    "done", total_cost_usd=0.37, usage={"input_tokens": 100}
+                )
+
+            async def interrupt(self):
+                self.interrupted = True
+
+        client = FakeClient()
+        text, _, usage = await envision.run_analysis(-1, "code_quality", client=client)
+
+        assert client.interrupted and client.drained
+        assert text == ""
+        assert usage.input_tokens == 100
+        assert usage.total_cost_usd == 0.37
+
+    def test_target_count_in_prompt(self):
+        """Test that an explicit target replaces the default range."""
+        assert "Find 2 high-value improvements" in build_analysis_prompt("all", 2)
+        assert "Find 3-5" in build_analysis_prompt("all")
+
+    def test_target_count_must_be_positive(self, monkeypatch, capsys):
+        """Test that --target-count rejects values below 1."""
+        for value in ["0", "-1"]:
+            monkeypatch.setattr(sys, "argv", ["envision.py", "--target-count", value])
+            with pytest.raises(SystemExit):
+                envision.parse_args()
+            assert "must be at least 1" in capsys.readouterr().err
+
+        monkeypatch.setattr(sys, "argv", ["envision.py", "--target-count", "2"])
+        assert envision.parse_args().target_count == 2
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Keep the response cache out of the user's real cache directory."""
+    path = tmp_path / "cache"
+    monkeypatch.setattr(envision, "CACHE_DIR", path)
+    return path
+
+
+class TestScanRepo:
+    """Tests for scan_repo."""
+
+    def test_fingerprint_changes_when_file_edited(self, tmp_path):
+        """Test that editing a file changes the fingerprint."""
+        source = tmp_path / "main.py"
+        source.write_text("a = 1\n")
+        before, _ = scan_repo(tmp_path)
+
+        source.write_text("a = 12\n")
+        assert scan_repo(tmp_path)[0] != before
+
+    def test_ignores_ignored_directories(self, tmp_path):
+        """Test that files under IGNORE_PATTERNS are not scanned."""
+        (tmp_path / "main.py").write_text("a = 1\n")
+        before = scan_repo(tmp_path)
+
+        (tmp_path / "__pycache__").mkdir()
+        (tmp_path / "__pycache__" / "main.cpython-311.pyc").write_bytes(b"x")
+        assert scan_repo(tmp_path) == before
+
+    def test_ignores_tool_caches(self, tmp_path):
+        """Test that test and lint runs don't change the fingerprint."""
+        (tmp_path / "main.py").write_text("a = 1\n")
+        before = scan_repo(tmp_path)
+
+        for name in [".pytest_cache", ".mypy_cache", ".ruff_cache"]:
+            (tmp_path / name).mkdir()
+            (tmp_path / name / "state").write_text("x")
+        assert scan_repo(tmp_path) == before
+
+    def test_skips_symlinked_directories(self, tmp_path):
+        """Test that directory symlinks are not followed or hashed."""
+        (tmp_path / "main.py").write_text("a = 1\n")
+        outside = tmp_path.parent / f"{tmp_path.name}-outside"
+        outside.mkdir()
+        (outside / "big.bin").write_bytes(b"x" * 100)
+        before = scan_repo(tmp_path)
+
+        (tmp_path / "link").symlink_to(outside, target_is_directory=True)
+        assert scan_repo(tmp_path) == before
+
+    def test_totals_file_sizes(self, tmp_path):
+        """Test that the size of every scanned file is summed."""
+        (tmp_path / "a.py").write_bytes(b"x" * 10)
+        (tmp_path / "pkg").mkdir()
+        (tmp_path / "pkg" / "b.py").write_bytes(b"x" * 5)
+        assert scan_repo(tmp_path)[1] == 15
+
+
+class TestResponseCache:
+    """Tests for the on-disk response cache."""
+
+    def test_round_trip(self):
+        """Test that a stored response is loaded back for the same inputs."""
+        envision.store_cached_response("prompt", "tree", None, "text", 4)
+        assert envision.load_cached_response("prompt", "tree") == ("text", 4)
+        assert envision.load_cached_response("prompt", "other-tree") is None
+
+    def test_store_prunes_oldest_entries(self, monkeypatch, cache_dir):
+        """Test that only the newest CACHE_MAX_ENTRIES responses are kept."""
+        monkeypatch.setattr(envision, "CACHE_MAX_ENTRIES", 2)
+        for i in range(3):
+            envision.store_cached_response("prompt", f"tree-{i}", None, "text", 1)
+            path = envision._cache_path("prompt", f"tree-{i}", None)
+            os.utime(path, ns=(i * 10**9, i * 10**9))
+
+        envision.store_cached_response("prompt", "tree-3", None, "text", 1)
+
+        assert len(list(cache_dir.glob("*.json"))) == 2
+        assert envision.load_cached_response("prompt", "tree-1") is None
+        assert envision.load_cached_response("prompt", "tree-2") is not None
+        assert envision.load_cached_response("prompt", "tree-3") is not None
+
+
+class TestSelectModel:
+    """Tests for select_model routing."""
+
+    def test_small_codebase_uses_fast_model(self):
+        """Test that every category of a small codebase is routed."""
+        assert select_model("potential_bugs", 1_000) == envision.FAST_MODEL
+
+    def test_fast_category_uses_fast_model(self):
+        """Test that simple categories are routed regardless of size."""
+        assert select_model("documentation_gaps", 10_000_000) == envision.FAST_MODEL
+
+    def test_large_codebase_uses_default(self):
+        """Test that other categories on large codebases keep the default model."""
+        assert select_model("potential_bugs", 10_000_000) is None
+
+
+class TestUsageStats:
+    """Tests for UsageStats cost accounting."""
+
+    def test_haiku_priced_lower_than_default(self):
+        """Test that the estimate follows the model's pricing."""
+        default = UsageStats(input_tokens=1_000_000, output_tokens=1_000_000)
+        haiku = UsageStats(
+            input_tokens=1_000_000, output_tokens=1_000_000, model=envision.FAST_MODEL
+        )
+        assert default.estimate_cost() == pytest.approx(18.0)
+        assert haiku.estimate_cost() == pytest.approx(4.8)
+
+    def test_add_keeps_each_runs_cost(self):
+        """Test that summed usage keeps per-model cost estimates."""
+        total = UsageStats()
+        total.add(UsageStats(input_tokens=1_000_000))
+        total.add(UsageStats(input_tokens=1_000_000, model=envision.FAST_MODEL))
+        total.add(UsageStats(total_cost_usd=0.5))
+
+        assert total.input_tokens == 2_000_000
+        assert total.estimate_cost() == pytest.approx(3.0 + 0.8 + 0.5)
+
+
+class TestAnalyzeCodebase:
+    """Tests for analyze_codebase fan-out."""
+
+    @pytest.mark.asyncio
+    async def test_runs_each_category_with_bounded_concurrency(self, monkeypatch):
+        """Test that categories run in parallel, at most max_agents at once."""
+        running = 0
+        peak = 0
+        seen = []
+
+        async def fake_run_analysis(
+            max_time, category, client=None, model=None, target_count=None
+        ):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            seen.append(category)
+            priority = "high" if category == "potential_bugs" else "low"
+            return make_block(category, category, priority), 2, UsageStats(input_tokens=10)
+
+        monkeypatch.setattr(envision, "run_analysis", fake_run_analysis)
+
+        result = await analyze_codebase(max_agents=2, max_time=60, category="all")
+
+        assert sorted(seen) == sorted(ANALYSIS_CATEGORIES)
+        assert peak == 2
+        assert len(result.improvements) == len(ANALYSIS_CATEGORIES)
+        assert result.improvements[0].category == "potential_bugs"
+        assert result.files_analyzed == 2 * len(ANALYSIS_CATEGORIES)
+        assert result.usage.input_tokens == 10 * len(ANALYSIS_CATEGORIES)
+
+    @pytest.mark.asyncio
+    async def test_single_category_runs_one_agent(self, monkeypatch):
+        """Test that a specific category only starts one analysis."""
+        seen = []
+
+        async def fake_run_analysis(
+            max_time, category, client=None, model=None, target_count=None
+        ):
+            seen.append(category)
+            return make_block(category, "Only"), 1, UsageStats()
+
+        monkeypatch.setattr(envision, "run_analysis", fake_run_analysis)
+
+        result = await analyze_codebase(max_agents=3, max_time=60, category="code_quality")
+
+        assert seen == ["code_quality"]
+        assert [i.title for i in result.improvements] == ["Only"]
+
+    @pytest.mark.asyncio
+    async def test_reuse_client_shares_sessions_across_categories(self, monkeypatch):
+        """Test that each agent slot connects one client and reuses it."""
+        clients = []
+
+        class FakeClient:
+            def __init__(self, options):
+                self.options = options
+                self.connected = False
+                clients.append(self)
+
+            async def __aenter__(self):
+                self.connected = True
+                return self
+
+            async def __aexit__(self, *exc_info):
+                self.connected = False
+
+        used = []
+
+        async def fake_run_analysis(
+            max_time, category, client=None, model=None, target_count=None
+        ):
+            assert client.connected
+            used.append(client)
+            await asyncio.sleep(0)
+            return make_block(category, category), 1, UsageStats()
+
+        monkeypatch.setattr(envision, "ClaudeSDKClient", FakeClient)
+        monkeypatch.setattr(envision, "run_analysis", fake_run_analysis)
+
+        result = await analyze_codebase(
+            max_agents=2, max_time=60, category="all", reuse_client=True
+        )
+
+        assert len(clients) == 2
+        assert len(used) == len(ANALYSIS_CATEGORIES)
+        assert set(map(id, used)) == set(map(id, clients))
+        assert not any(c.connected for c in clients)
+        assert len(result.improvements) == len(ANALYSIS_CATEGORIES)
+
+    @pytest.mark.asyncio
+    async def test_reused_client_cost_counted_once(self, monkeypatch):
+        """Test that a reused session's running cost total is not summed."""
+
+        class FakeClient:
+            def __init__(self, options):
+                self.options = options
+                self.session_cost = 0.0
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc_info):
+                pass
+
+            async def query(self, prompt):
+                pass
+
+            async def receive_response(self):
+                self.session_cost += 0.25
+                yield make_result_message(
+                    "done", total_cost_usd=self.session_cost, usage={"input_tokens": 10}
+                )
+
+        monkeypatch.setattr(envision, "ClaudeSDKClient", FakeClient)
+        monkeypatch.setattr(envision, "ANALYSIS_CATEGORIES", ["code_quality", "potential_bugs"])
+
+        result = await analyze_codebase(
+            max_agents=1, max_time=60, category="all", reuse_client=True,
+            use_cache=False, model="model",
+        )
+
+        assert result.usage.input_tokens == 20
+        assert result.usage.total_cost_usd == pytest.approx(0.5)
+
+    @pytest.mark.asyncio
+    async def test_cached_response_skips_query(self, monkeypatch, cache_dir):
+        """Test that an unchanged codebase is answered from the cache."""
+        calls = []
+
+        async def fake_run_analysis(
+            max_time, category, client=None, model=None, target_count=None
+        ):
+            calls.append(category)
+            return make_block(category, "Cached"), 3, UsageStats(input_tokens=10)
+
+        monkeypatch.setattr(envision, "run_analysis", fake_run_analysis)
+        monkeypatch.setattr(envision, "scan_repo", lambda: ("tree", 0))
+
+        first = await analyze_codebase(max_agents=1, max_time=60, category="code_quality")
+        second = await analyze_codebase(max_agents=1, max_time=60, category="code_quality")
+
+        assert calls == ["code_quality"]
+        assert [i.title for i in second.improvements] == ["Cached"]
+        assert second.files_analyzed == first.files_analyzed == 3
+        assert second.usage.input_tokens == 0
+
+        await analyze_codebase(
+            max_agents=1, max_time=60, category="code_quality", use_cache=False
+        )
+        assert calls == ["code_quality", "code_quality"]
+
+    @pytest.mark.asyncio
+    async def test_codebase_change_invalidates_cache(self, monkeypatch):
+        """Test that a different fingerprint misses the cache."""
+        calls = []
+        fingerprint = "tree-1"
+
+        async def fake_run_analysis(
+            max_time, category, client=None, model=None, target_count=None
+        ):
+            calls.append(category)
+            return make_block(category, "Fresh"), 1, UsageStats()
+
+        monkeypatch.setattr(envision, "run_analysis", fake_run_analysis)
+        monkeypatch.setattr(envision, "scan_repo", lambda: (fingerprint, 0))
+
+        await analyze_codebase(max_agents=1, max_time=60, category="code_quality")
+        fingerprint = "tree-2"
+        await analyze_codebase(max_agents=1, max_time=60, category="code_quality")
+
+        assert calls == ["code_quality", "code_quality"]
+
+    @pytest.mark.asyncio
+    async def test_failed_category_keeps_other_results(self, monkeypatch, capsys):
+        """Test that one agent failing does not discard the other categories."""
+
+        async def fake_run_analysis(
+            max_time, category, client=None, model=None, target_count=None
+        ):
+            if category == "missing_tests":
+                raise RuntimeError("connection lost")
+            return make_block(category, category), 1, UsageStats()
+
+        monkeypatch.setattr(envision, "run_analysis", fake_run_analysis)
+
+        result = await analyze_codebase(max_agents=4, max_time=60, category="all")
+
+        titles = {i.title for i in result.improvements}
+        assert titles == set(ANALYSIS_CATEGORIES) - {"missing_tests"}
+        assert "missing_tests analysis failed: connection lost" in capsys.readouterr().err
+
+    @pytest.mark.asyncio
+    async def test_all_categories_failing_raises(self, monkeypatch):
+        """Test that an error is raised when no category succeeds."""
+
+        async def fake_run_analysis(
+            max_time, category, client=None, model=None, target_count=None
+        ):
+            raise RuntimeError("offline")
+
+        monkeypatch.setattr(envision, "run_analysis", fake_run_analysis)
+
+        with pytest.raises(RuntimeError, match="offline"):
+            await analyze_codebase(max_agents=2, max_time=60, category="all")
+
+    @pytest.mark.asyncio
+    async def test_routes_each_category_to_its_model(self, monkeypatch):
+        """Test that categories get the model select_model picks for them."""
+        models = {}
+
+        async def fake_run_analysis(
+            max_time, category, client=None, model=None, target_count=None
+        ):
+            models[category] = model
+            return "", 0, UsageStats()
+
+        monkeypatch.setattr(envision, "run_analysis", fake_run_analysis)
+        monkeypatch.setattr(envision, "scan_repo", lambda: ("tree", 10_000_000))
+
+        await analyze_codebase(max_agents=4, max_time=60, category="all", use_cache=False)
+        assert models == {
+            c: envision.FAST_MODEL if c in envision.FAST_CATEGORIES else None
+            for c in ANALYSIS_CATEGORIES
+        }
+
+        await analyze_codebase(
+            max_agents=4, max_time=60, category="all", use_cache=False, model="opus"
+        )
+        assert set(models.values()) == {"opus"}
+
+
+class TestFormatOutputText:
+    """Tests for format_output_text."""
+
+    def test_lists_improvements_and_usage(self):
+        """Test that each improvement and the usage block are rendered."""
+        result = EnvisionResult(
+            improvements=[Improvement(
+                category="potential_bugs",
+                title="Guard empty input",
+                description="Check for None",
+                file_path="agent.py",
+                estimated_time_minutes=5,
+                priority="high",
+            )],
+            analysis_time_seconds=2.5,
+            files_analyzed=3,
+            usage=UsageStats(input_tokens=1200, output_tokens=300),
+        )
+
+        text = format_output_text(result)
+
+        assert "Improvements found: 1\n" in text
+        assert "  Total tokens:  1,500\n" in text
+        assert "[!] 1. Guard empty input\n   Category: Potential Bugs\n" in text
+        assert "   File: agent.py\n\n   Check for None\n\n" in text
+        assert text.endswith("No changes have been made.\n" + "=" * 60 + "\n")
+
+    def test_no_improvements(self):
+        """Test the message shown when nothing was found."""
+        text = format_output_text(EnvisionResult([], 1.0, 1))
+        assert "No improvements identified. The codebase looks good!\n" in text
+        assert "API USAGE" not in text
+
+
+class TestFormatOutputJson:
+    """Tests for format_output_json."""
+
+    def test_round_trips_result(self):
+        """Test that the JSON document carries every reported field."""
+        result = EnvisionResult(
+            improvements=[Improvement(
+                category="documentation_gaps",
+                title="Document caché",
+                description="Explain the cache",
+                file_path=None,
+                estimated_time_minutes=4,
+                priority="low",
+            )],
+            analysis_time_seconds=1.5,
+            files_analyzed=2,
+            usage=UsageStats(input_tokens=10, output_tokens=5, total_cost_usd=0.25),
+        )
+
+        output = format_output_json(result)
+        data = json.loads(output)
+
+        assert "caché" in output
+        assert data["improvements_count"] == 1
+        assert data["improvements"][0] == {
+            "category": "documentation_gaps",
+            "title": "Document caché",
+            "description": "Explain the cache",
+            "file_path": None,
+            "estimated_time_minutes": 4,
+            "priority": "low",
+        }
+        assert data["usage"]["total_tokens"] == 15
+        assert data["usage"]["estimated_cost_usd"] == 0.25
+
+
+class TestWriteGithubSummary:
+    """Tests for write_github_summary."""
+
+    @pytest.mark.asyncio
+    async def test_appends_to_step_summary(self, tmp_path, monkeypatch):
+        """Test that the summary is appended to GITHUB_STEP_SUMMARY."""
+        summary = tmp_path / "summary.md"
+        summary.write_text("previous step\n")
+        monkeypatch.setenv("GITHUB_STEP_SUMMARY", str(summary))
+        result = EnvisionResult(
+            improvements=[Improvement(
+                category="code_quality",
+                title="Tidy up",
+                description="Details",
+                file_path=None,
+                estimated_time_minutes=5,
+                priority="high",
+            )],
+            analysis_time_seconds=1.0,
+            files_analyzed=2,
+        )
+
+        await write_github_summary(result)
+
+        text = summary.read_text()
+        assert text.startswith("previous step\n## Envision Analysis Results")
+        assert "| 🔴 HIGH | Tidy up | Code Quality | ~5 min |" in text
+
+    @pytest.mark.asyncio
+    async def test_no_summary_file_is_noop(self, monkeypatch):
+        """Test that nothing happens outside GitHub Actions."""
+        monkeypatch.delenv("GITHUB_STEP_SUMMARY", raising=False)
+        await write_github_summary(EnvisionResult([], 0.0, 0))
@@ -1,6 +1,8 @@
 """Tests for the Task Detector module."""
 
+import os
 import sys
+from dataclasses import FrozenInstanceError
 from pathlib import Path
 from unittest.mock import patch
 
@@ -177,18 +179,18 @@ class TestParseTodoMd:
         tasks = parse_todo_md(todo_with_backlog_tasks)
 
         assert len(tasks) == 3
-        assert tasks[0]["title"] == "Add configuration file support"
-        assert tasks[0]["priority"] == "HIGH"
-        assert tasks[0]["type"] == "@config"
-        assert tasks[0]["source"] == "TODO.md"
+        assert tasks[0].title == "Add configuration file support"
+        assert tasks[0].priority == "HIGH"
+        assert tasks[0].type == "@config"
+        assert tasks[0].source == "TODO.md"
 
     def test_parse_in_progress_tasks(self, todo_with_in_progress_tasks):
         """Test parsing tasks from in-progress section."""
         tasks = parse_todo_md(todo_with_in_progress_tasks)
 
         assert len(tasks) == 2
-        assert tasks[0]["title"] == "Implement file logging"
-        assert tasks[0]["priority"] == "HIGH"
+        assert tasks[0].title == "Implement file logging"
+        assert tasks[0].priority == "HIGH"
 
     def test_empty_file_returns_empty_list(self, empty_todo_md):
         """Test that empty file returns empty list."""
@@ -264,9 +266,9 @@ Should not be parsed.
         tasks = parse_todo_md(path)
 
         assert len(tasks) == 3
-        assert "rocket launch feature" in tasks[0]["title"]
-        assert "handling" in tasks[1]["title"]
-        assert tasks[0]["priority"] == "HIGH"
+        assert "rocket launch feature" in tasks[0].title
+        assert "handling" in tasks[1].title
+        assert tasks[0].priority == "HIGH"
 
     def test_special_characters_in_task_title(self, temp_dir):
         """Test that special characters in task titles are handled correctly."""
@@ -282,9 +284,9 @@ Should not be parsed.
         tasks = parse_todo_md(path)
 
         assert len(tasks) == 3
-        assert "C++ & C#" in tasks[0]["title"]
-        assert "spaces" in tasks[1]["title"]
-        assert "regex" in tasks[2]["title"]
+        assert "C++ & C#" in tasks[0].title
+        assert "spaces" in tasks[1].title
+        assert "regex" in tasks[2].title
 
     def test_simple_in_progress_header_format(self, temp_dir):
         """Test simple header format in in-progress section."""
@@ -305,10 +307,10 @@ Working on this now.
 
         assert len(tasks) == 2
         # The simple header task should have None for priority and type
-        simple_task = next((t for t in tasks if t["priority"] is None), None)
+        simple_task = next((t for t in tasks if t.priority is None), None)
         assert simple_task is not None
-        assert simple_task["title"] == "Simple task without priority"
-        assert simple_task["type"] is None
+        assert simple_task.title == "Simple task without priority"
+        assert simple_task.type is None
 
     def test_tasks_in_completed_section_ignored(self, temp_dir):
         """Test that tasks in completed section are ignored."""
@@ -328,6 +330,27 @@ _No tasks currently in progress_
         tasks = parse_todo_md(path)
         assert tasks == []
 
+    def test_sections_after_completed_still_parsed(self, temp_dir):
+        """Test that skipping Completed resumes at the next section."""
+        path = temp_dir / "TODO.md"
+        path.write_text("""# TODO
+
+## Completed
+
+### [HIGH] @feature - This should be ignored
+### Ignored too
+
+## Backlog
+
+### [LOW] @test - Add unit tests
+
+## Notes
+
+### [MED] @docs - Not a task
+""")
+        tasks = parse_todo_md(path)
+        assert [(t.title, t.priority) for t in tasks] == [("Add unit tests", "LOW")]
+
     def test_lowercase_priority_normalized_to_uppercase(self, temp_dir):
         """Test that lowercase priorities are normalized to uppercase."""
         path = temp_dir / "TODO.md"
@@ -341,8 +364,8 @@ _No tasks currently in progress_
         tasks = parse_todo_md(path)
 
         assert len(tasks) == 2
-        assert tasks[0]["priority"] == "HIGH"
-        assert tasks[1]["priority"] == "MED"
+        assert tasks[0].priority == "HIGH"
+        assert tasks[1].priority == "MED"
 
     def test_placeholder_text_ignored(self, temp_dir):
         """Test that placeholder text in in-progress is ignored."""
@@ -360,7 +383,7 @@ _No tasks currently in progress_
         tasks = parse_todo_md(path)
 
         assert len(tasks) == 1
-        assert tasks[0]["title"] == "Real task"
+        assert tasks[0].title == "Real task"
 
 
 # ============================================================================
@@ -376,10 +399,10 @@ class TestParsePlanMd:
         tasks = parse_plan_md(plan_with_unchecked_items)
 
         assert len(tasks) == 3
-        assert tasks[0]["title"] == "Add configuration file support"
-        assert tasks[0]["source"] == "PLAN.md"
-        assert tasks[0]["priority"] is None
-        assert tasks[0]["type"] is None
+        assert tasks[0].title == "Add configuration file support"
+        assert tasks[0].source == "PLAN.md"
+        assert tasks[0].priority is None
+        assert tasks[0].type is None
 
     def test_empty_file_returns_empty_list(self, empty_plan_md):
         """Test that empty file returns empty list."""
@@ -411,7 +434,7 @@ class TestParsePlanMd:
         tasks = parse_plan_md(path)
 
         assert len(tasks) == 1
-        assert tasks[0]["title"] == "Unchecked task"
+        assert tasks[0].title == "Unchecked task"
 
     def test_unicode_emoji_in_task_title(self, temp_dir):
         """Test that Unicode/emoji in task titles are handled correctly."""
@@ -424,7 +447,15 @@ class TestParsePlanMd:
         tasks = parse_plan_md(path)
 
         assert len(tasks) == 2
-        assert "rocket" in tasks[0]["title"]
+        assert "rocket" in tasks[0].title
+
+    def test_invalid_utf8_in_task_title_is_replaced(self, temp_dir):
+        """Test that undecodable bytes in a title do not abort parsing."""
+        path = temp_dir / "PLAN.md"
+        path.write_bytes(b"- [ ] Caf\xe9 menu\n- [ ] Caf\xc3\xa9 menu\n")
+        tasks = parse_plan_md(path)
+
+        assert [task.title for task in tasks] == ["Caf\ufffd menu", "Caf\u00e9 menu"]
 
     def test_special_characters_in_task_title(self, temp_dir):
         """Test that special characters in task titles are handled correctly."""
@@ -438,9 +469,9 @@ class TestParsePlanMd:
         tasks = parse_plan_md(path)
 
         assert len(tasks) == 3
-        assert "C++ & C#" in tasks[0]["title"]
-        assert "regex" in tasks[1]["title"]
-        assert "https://" in tasks[2]["title"]
+        assert "C++ & C#" in tasks[0].title
+        assert "regex" in tasks[1].title
+        assert "https://" in tasks[2].title
 
     def test_empty_checkbox_with_extra_spaces(self, temp_dir):
         """Test that checkbox with various spacing is handled correctly."""
@@ -459,7 +490,7 @@ class TestParsePlanMd:
         # - \s+ after ] allows multiple spaces
         # All three variations match the pattern
         assert len(tasks) == 3
-        titles = [t["title"] for t in tasks]
+        titles = [t.title for t in tasks]
         assert "Extra space in checkbox" in titles
         assert "Extra space before checkbox" in titles
         assert "Extra space after checkbox" in titles
@@ -478,6 +509,18 @@ class TestParsePlanMd:
         # All unchecked items should be captured (they get stripped)
         assert len(tasks) == 3
 
+    def test_checkbox_mid_line_ignored(self, temp_dir):
+        """Test that a checkbox not at the start of its line is not a task."""
+        path = temp_dir / "PLAN.md"
+        path.write_text("""# Plan
+
+Use - [ ] to mark open items
+- [ ] Real task
+""")
+        tasks = parse_plan_md(path)
+
+        assert [task.title for task in tasks] == ["Real task"]
+
 
 # ============================================================================
 # Tests for parse_claude_md
@@ -507,12 +550,23 @@ A Python-based agent.
         tasks = parse_claude_md(path)
         assert tasks == []
 
+    def test_content_without_markers_skips_regex(self, temp_dir):
+        """Test that a file with no ']' or 'todo:' never reaches the regex."""
+        path = temp_dir / "CLAUDE.md"
+        path.write_text("# CLAUDE.md\n\nContext only: no action items here.\n")
+
+        with patch("task_detector._ACTION_RE") as mock_re:
+            tasks = parse_claude_md(path)
+
+        assert tasks == []
+        mock_re.finditer.assert_not_called()
+
     def test_parse_action_items(self, claude_with_action_items):
         """Test parsing action items from CLAUDE.md."""
         tasks = parse_claude_md(claude_with_action_items)
 
         assert len(tasks) == 2
-        assert tasks[0]["source"] == "CLAUDE.md"
+        assert tasks[0].source == "CLAUDE.md"
 
     def test_empty_file_returns_empty_list(self, empty_claude_md):
         """Test that empty file returns empty list."""
@@ -559,8 +613,8 @@ Todo: Mixed case todo
         tasks = parse_claude_md(path)
 
         assert len(tasks) == 2
-        assert tasks[0]["title"] == "First action item"
-        assert tasks[1]["title"] == "Second action item"
+        assert tasks[0].title == "First action item"
+        assert tasks[1].title == "Second action item"
 
     def test_unicode_emoji_in_task_title(self, temp_dir):
         """Test that Unicode/emoji in task titles are handled correctly."""
@@ -585,8 +639,8 @@ TODO: Handle paths with "quotes" and 'apostrophes'
         tasks = parse_claude_md(path)
 
         assert len(tasks) == 2
-        assert "C++ & C#" in tasks[0]["title"]
-        assert "quotes" in tasks[1]["title"]
+        assert "C++ & C#" in tasks[0].title
+        assert "quotes" in tasks[1].title
 
 
 # ============================================================================
@@ -616,7 +670,7 @@ TODO: Claude item C
         tasks = get_pending_tasks(temp_dir)
 
         assert len(tasks) == 3
-        sources = {t["source"] for t in tasks}
+        sources = {t.source for t in tasks}
         assert sources == {"TODO.md", "PLAN.md", "CLAUDE.md"}
 
     def test_sorted_by_priority(self, temp_dir):
@@ -638,10 +692,33 @@ TODO: Claude item C
         tasks = get_pending_tasks(temp_dir)
 
         assert len(tasks) == 4
-        assert tasks[0]["priority"] == "HIGH"
-        assert tasks[1]["priority"] == "MED"
-        assert tasks[2]["priority"] == "LOW"
-        assert tasks[3]["priority"] is None
+        assert tasks[0].priority == "HIGH"
+        assert tasks[1].priority == "MED"
+        assert tasks[2].priority == "LOW"
+        assert tasks[3].priority is None
+
+    def test_sort_is_stable_and_unknown_priorities_go_last(self, temp_dir):
+        """Test that equal priorities keep file order and unknown ones sort with None."""
+        (temp_dir / "TODO.md").write_text("""# TODO
+
+## Backlog
+
+### [URGENT] @bug - Unknown priority
+### [HIGH] @feature - First high
+### [LOW] @test - Low task
+### [HIGH] @feature - Second high
+""")
+        (temp_dir / "PLAN.md").write_text("- [ ] Plan item")
+
+        titles = [t.title for t in get_pending_tasks(temp_dir)]
+
+        assert titles == [
+            "First high",
+            "Second high",
+            "Low task",
+            "Unknown priority",
+            "Plan item",
+        ]
 
     def test_empty_directory_returns_empty_list(self, temp_dir):
         """Test that empty directory returns empty list."""
@@ -669,7 +746,7 @@ TODO: Claude item C
         tasks = get_pending_tasks(str(temp_dir))
 
         assert len(tasks) == 1
-        assert tasks[0]["title"] == "Task from string path"
+        assert tasks[0].title == "Task from string path"
 
 
 # ============================================================================
@@ -714,6 +791,23 @@ class TestHasPendingTasks:
         # The parsers should handle missing files gracefully
         assert has_pending_tasks(missing_dir) is False
 
+    def test_stops_after_first_file_with_tasks(self, temp_dir):
+        """Test that later files are not parsed once a task is found."""
+        (temp_dir / "TODO.md").write_text("## Backlog\n\n### [LOW] @chore - First\n")
+        (temp_dir / "PLAN.md").write_text("- [ ] Never read")
+
+        real_open = open
+        read_names = []
+
+        def tracking_open(file, *args, **kwargs):
+            read_names.append(Path(file).name)
+            return real_open(file, *args, **kwargs)
+
+        with patch("builtins.open", tracking_open):
+            assert has_pending_tasks(temp_dir) is True
+
+        assert read_names == ["TODO.md"]
+
 
 # ============================================================================
 # Tests for OSError Handling
@@ -728,7 +822,7 @@ class TestOSErrorHandling:
         path = temp_dir / "TODO.md"
         path.write_text("# TODO")
 
-        with patch.object(Path, "read_text", side_effect=OSError("Permission denied")):
+        with patch("builtins.open", side_effect=OSError("Permission denied")):
             # Need a real path that exists for the exists() check to pass
             tasks = parse_todo_md(path)
             # The mock will raise OSError, function should catch it
@@ -739,7 +833,7 @@ class TestOSErrorHandling:
         path = temp_dir / "PLAN.md"
         path.write_text("# Plan")
 
-        with patch.object(Path, "read_text", side_effect=OSError("Permission denied")):
+        with patch("builtins.open", side_effect=OSError("Permission denied")):
             tasks = parse_plan_md(path)
             assert tasks == []
 
@@ -748,11 +842,105 @@ class TestOSErrorHandling:
         path = temp_dir / "CLAUDE.md"
         path.write_text("# Claude")
 
-        with patch.object(Path, "read_text", side_effect=OSError("Permission denied")):
+        with patch("builtins.open", side_effect=OSError("Permission denied")):
             tasks = parse_claude_md(path)
             assert tasks == []
 
 
+# ============================================================================
+# Tests for the parse cache
+# ============================================================================
+
+
+class TestParseCache:
+    """Tests for reusing parsed tasks while a file is unchanged."""
+
+    def test_unchanged_file_is_not_reread(self, temp_dir):
+        """Test that a second parse of an unchanged file skips the read."""
+        path = temp_dir / "PLAN.md"
+        path.write_text("- [ ] Cached task")
+        assert parse_plan_md(path)[0].title == "Cached task"
+
+        with patch("builtins.open", side_effect=AssertionError("re-read")):
+            tasks = parse_plan_md(path)
+
+        assert tasks[0].title == "Cached task"
+
+    def test_modified_file_is_reparsed(self, temp_dir):
+        """Test that a change to the file invalidates the cached tasks."""
+        path = temp_dir / "PLAN.md"
+        path.write_text("- [ ] Old task")
+        parse_plan_md(path)
+
+        path.write_text("- [ ] New task")
+        st = path.stat()
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+        assert parse_plan_md(path)[0].title == "New task"
+
+    def test_touched_file_with_same_content_is_not_rescanned(self, temp_dir):
+        """Test that an mtime bump without a content change reuses the tasks."""
+        path = temp_dir / "PLAN.md"
+        path.write_text("- [ ] Cached task")
+        parse_plan_md(path)
+
+        st = path.stat()
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+        with patch("task_detector._UNCHECKED_RE") as mock_re:
+            mock_re.finditer.side_effect = AssertionError("rescanned")
+            tasks = parse_plan_md(path)
+
+        assert tasks[0].title == "Cached task"
+
+    def test_cache_is_bounded(self, temp_dir):
+        """Test that the oldest entries are evicted past the size cap."""
+        import task_detector
+
+        with patch.object(task_detector, "_PARSE_CACHE", {}), \
+                patch.object(task_detector, "_PARSE_CACHE_MAX", 2):
+            paths = []
+            for i in range(3):
+                path = temp_dir / f"PLAN{i}.md"
+                path.write_text(f"- [ ] Task {i}")
+                parse_plan_md(path)
+                paths.append(os.path.realpath(path))
+
+            cached_paths = [key[1] for key in task_detector._PARSE_CACHE]
+            assert cached_paths == paths[1:]
+
+    def test_path_spellings_share_one_entry(self, temp_dir, monkeypatch):
+        """Test that relative, absolute and symlinked paths hit the same entry."""
+        import task_detector
+
+        path = temp_dir / "PLAN.md"
+        path.write_text("- [ ] Cached task")
+        (temp_dir / "link.md").symlink_to(path)
+        monkeypatch.chdir(temp_dir)
+
+        with patch.object(task_detector, "_PARSE_CACHE", {}):
+            for spelling in [path, "PLAN.md", "./PLAN.md", "link.md"]:
+                assert parse_plan_md(spelling)[0].title == "Cached task"
+
+            assert len(task_detector._PARSE_CACHE) == 1
+
+    def test_returned_list_is_a_copy(self, temp_dir):
+        """Test that mutating a returned list does not corrupt the cache."""
+        path = temp_dir / "PLAN.md"
+        path.write_text("- [ ] Original")
+        parse_plan_md(path).clear()
+
+        assert parse_plan_md(path)[0].title == "Original"
+
+    def test_tasks_are_immutable(self, temp_dir):
+        """Test that cached tasks cannot be modified in place."""
+        path = temp_dir / "PLAN.md"
+        path.write_text("- [ ] Original")
+
+        with pytest.raises(FrozenInstanceError):
+            parse_plan_md(path)[0].title = "Mutated"
+
+
 # ============================================================================
 # Tests for Module Import
 # ============================================================================